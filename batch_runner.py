@@ -0,0 +1,141 @@
+"""
+Headless batch analysis of feedback files
+
+Example:
+    python batch_runner.py "exports/*.csv" --column Comments --jobs 4 --output-dir insights
+
+Each input file gets its own `<file name>.insights.json` in the output
+directory plus a combined `rollup.insights.json`. Files whose output already
+exists are skipped, so a crashed run can simply be restarted.
+"""
+import argparse
+import glob
+import importlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from feedback_analyzer import DEFAULT_BATCH_TOKENS, DEFAULT_MAX_IN_FLIGHT, FeedbackAnalyzer
+from feedback_ingest import FILE_STRUCTURES, iter_comments
+from response_cache import ResponseCache
+from result_store import ResultStore
+
+INPUT_EXTENSIONS = ('.csv', '.txt')
+OUTPUT_SUFFIX = '.insights.json'
+ROLLUP_FILENAME = 'rollup' + OUTPUT_SUFFIX
+
+
+def find_input_files(patterns):
+    """Expand directories and glob patterns into a sorted list of CSV/TXT files"""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        for path in glob.glob(pattern):
+            if os.path.isfile(path) and path.lower().endswith(INPUT_EXTENSIONS):
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def output_path(input_file, output_dir):
+    return os.path.join(output_dir, os.path.basename(input_file) + OUTPUT_SUFFIX)
+
+
+def analyze_file(analyzer, input_file, output_file, args, history=None):
+    """Stream one file through the analyzer and save its insights"""
+    with open(input_file, 'rb') as f:
+        comments = iter_comments(f, args.structure, start_line=args.start_line, column=args.column)
+        insights = analyzer.analyze_feedback(comments)
+    insights['source_file'] = input_file
+    analyzer.save_insights(insights, output_file)
+    if history is not None:
+        history.record_run(insights)
+    return insights
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze feedback files with Gemini without the dashboard")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of CSV/TXT files")
+    parser.add_argument('--output-dir', default='insights', help="Where to write the insights JSON files")
+    parser.add_argument('--structure', choices=FILE_STRUCTURES, default="Standard CSV",
+                        help="How the files are structured (same options as the dashboard)")
+    parser.add_argument('--column',
+                        help="CSV column containing the feedback (defaults to 'feedback' if present, else the first)")
+    parser.add_argument('--start-line', type=int, default=1,
+                        help="First line to read for 'One Comment Per Line' files")
+    parser.add_argument('--jobs', type=int, default=2, help="Number of files processed concurrently")
+    parser.add_argument('--model', default='gemini-flash-latest', help="Gemini model name")
+    parser.add_argument('--strong-model', help="Model for large or ambiguous batches (enables routing)")
+    parser.add_argument('--hedge-after', type=float,
+                        help="Seconds after which a slow request is duplicated and the first answer used")
+    parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'),
+                        help="Gemini API key (defaults to $GEMINI_API_KEY)")
+    parser.add_argument('--batch-tokens', type=int, default=DEFAULT_BATCH_TOKENS,
+                        help="Approximate prompt tokens per model call")
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Maximum concurrent model calls across all files")
+    parser.add_argument('--requests-per-minute', type=int, help="Request quota to stay under")
+    parser.add_argument('--tokens-per-minute', type=int, help="Token quota to stay under")
+    parser.add_argument('--cache-db', help="SQLite file for the persistent response cache")
+    parser.add_argument('--history-db', help="SQLite file to append each file's insights to for trend views")
+    parser.add_argument('--local-fast-path', action='store_true', help="Classify simple comments locally")
+    parser.add_argument('--cluster', action='store_true', help="Prompt one representative per comment cluster")
+    parser.add_argument('--force', action='store_true', help="Re-analyze files that already have output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.api_key:
+        print("Error: pass --api-key or set GEMINI_API_KEY", file=sys.stderr)
+        return 2
+
+    input_files = find_input_files(args.inputs)
+    if not input_files:
+        print("Error: no CSV/TXT files matched", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    analyzer = FeedbackAnalyzer.from_options(
+        args.api_key, args.model, strong_model=args.strong_model, hedge_after=args.hedge_after,
+        local_fast_path=args.local_fast_path, cluster=args.cluster,
+        batch_tokens=args.batch_tokens, max_in_flight=args.max_in_flight,
+        requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute,
+        cache=ResponseCache(disk_path=args.cache_db) if args.cache_db else None
+    )
+
+    history = ResultStore(args.history_db) if args.history_db else None
+
+    pending = [path for path in input_files
+               if args.force or not os.path.exists(output_path(path, args.output_dir))]
+    print(f"{len(input_files)} files found, {len(input_files) - len(pending)} already done, {len(pending)} to analyze")
+
+    if args.structure == "Standard CSV":
+        # CSV parsing imports pandas lazily; worker threads importing it for the first time at once
+        # can see a partially initialized module, so it is loaded here before they start
+        importlib.import_module('pandas')
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(analyze_file, analyzer, path, output_path(path, args.output_dir), args, history): path
+                   for path in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures += 1
+                print(f"Error analyzing {futures[future]}: {e}", file=sys.stderr)
+
+    completed = [output_path(path, args.output_dir) for path in input_files
+                 if os.path.exists(output_path(path, args.output_dir))]
+    if completed:
+        results = [analyzer.load_insights(path) for path in completed]
+        rollup = analyzer.combine_insights(results)
+        rollup['source_files'] = [insights.get('source_file', path) for insights, path in zip(results, completed)]
+        analyzer.save_insights(rollup, os.path.join(args.output_dir, ROLLUP_FILENAME))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+Performance benchmarks against a deterministic fake Gemini backend
+
+Example:
+    python benchmark.py --sizes 1000,10000,100000 --latency 0.05 --save-baseline bench_baseline.json
+    python benchmark.py --sizes 1000,10000,100000 --latency 0.05 --compare bench_baseline.json
+
+`genai.GenerativeModel` is replaced by `FakeGenerativeModel`, which sleeps
+for a configurable latency/token throughput, fails a configurable fraction of
+calls with a retryable 429 and returns canned JSON, so results depend only on
+this code. Every case runs in a fresh process so its peak RSS is its own.
+With `--compare`, the run fails (exit code 1) when throughput drops, or peak
+RSS or prompt tokens grow, by more than `--tolerance` against the baseline.
+
+`python benchmark.py --imports` instead checks the cold import time of the
+entry points (`python -X importtime`) against `IMPORT_BUDGETS_MS` and that
+none of them loads a dependency listed in `LAZY_DEPENDENCIES`.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+INGEST_STRUCTURES = ("Standard CSV", "Comma Separated", "One Comment Per Line")
+
+# Metrics compared against a baseline, and whether a higher value is better
+BASELINE_METRICS = {
+    'comments_per_second': True,
+    'peak_rss_mb': False,
+    'prompt_tokens': False,
+}
+
+# Cold import budgets in milliseconds (cumulative `-X importtime`); importing
+# streamlit_dashboard runs the script in bare mode, i.e. a first page render
+IMPORT_BUDGETS_MS = {
+    'feedback_analyzer': 250,
+    'batch_runner': 300,
+    'dashboard_resources': 1200,
+    'streamlit_dashboard': 1500,
+}
+
+# Heavy dependencies the entry points must only import on the code paths that need them
+LAZY_DEPENDENCIES = ('google.generativeai', 'pandas', 'numpy', 'plotly.express')
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$')
+
+COMMENT_TEMPLATES = [
+    "The app crashes when I open report {n}.",
+    "Love the new dashboard, build {n} is much faster!",
+    "Pricing went up again for plan {n}, too expensive.",
+    "Support ticket {n} was answered within an hour, thanks.",
+    "Export to CSV times out for files over {n} MB.",
+    "Search results are confusing, could not find invoice {n}.",
+    "Dark mode looks great on version {n}.",
+    "Mobile sync is slow, takes {n} seconds to load.",
+]
+
+CANNED_SUMMARY = {
+    'summary': "Users like recent improvements but report stability and pricing problems.",
+    'recommendations': ["Fix crash on report open", "Review pricing tiers", "Speed up exports"],
+}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name='fake-model', latency=0.0, tokens_per_second=None, error_rate=0.0,
+                 tail_rate=0.0, tail_latency=0.0, seed=0):
+        """
+        Stand-in for `genai.GenerativeModel` that needs no network
+
+        Each call sleeps `latency` seconds plus the time to "generate" the
+        response at `tokens_per_second` (plus `tail_latency` for a
+        `tail_rate` fraction of calls), raises a 429 error with probability
+        `error_rate`, and answers with canned JSON sized to the prompt.
+        Prompt tokens, call count and call latencies are recorded.
+        """
+        self.model_name = model_name
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.call_latencies = []
+
+    def _respond(self, prompt):
+        if prompt.startswith("The following aggregated insights"):
+            return CANNED_SUMMARY
+        feedback = prompt.split("Feedback:\n", 1)[-1].split("\n\nReturn", 1)[0]
+        lines = [line for line in feedback.splitlines() if line.strip()]
+        if prompt.startswith("Label each"):
+            ids = [int(i) for i in re.findall(r'^\[(\d+)\]', feedback, re.M)]
+            return {
+                'themes': ["Stability", "Pricing"],
+                'issues': [{'issue': "App crashes", 'priority': 'high'}],
+                'labels': [{'id': i, 'sentiment': ('negative', 'positive', 'neutral')[i % 3],
+                            'themes': [i % 2], 'issues': [0] if i % 3 == 0 else []} for i in ids],
+            }
+        count = len(lines)
+        return {
+            'sentimentDistribution': [
+                {'name': 'Positive', 'value': count // 3},
+                {'name': 'Negative', 'value': count // 3},
+                {'name': 'Neutral', 'value': count - 2 * (count // 3)},
+            ],
+            'topThemes': [
+                {'theme': "Stability", 'count': count // 2, 'sentiment': 'negative'},
+                {'theme': "Performance", 'count': count // 4, 'sentiment': 'positive'},
+            ],
+            'criticalIssues': [{'issue': "App crashes", 'priority': 'high', 'mentions': count // 5}],
+            'trendingTopics': [{'topic': "dark mode", 'mentions': count // 10}],
+            **CANNED_SUMMARY,
+        }
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        start = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += len(prompt) // 4 + 1
+            fail = self._random.random() < self.error_rate
+            slow = bool(self.tail_rate) and self._random.random() < self.tail_rate
+        text = json.dumps(self._respond(prompt))
+        delay = self.latency + (self.tail_latency if slow else 0.0)
+        if self.tokens_per_second:
+            delay += (len(text) // 4 + 1) / self.tokens_per_second
+        time.sleep(delay)
+        with self._lock:
+            self.call_latencies.append(time.perf_counter() - start)
+            if fail:
+                self.errors += 1
+        if fail:
+            raise FakeAPIError(429, "Resource exhausted (fake)")
+        if stream:
+            return [FakeResponse(text[i:i + 200]) for i in range(0, len(text), 200)]
+        return FakeResponse(text)
+
+
+@contextmanager
+def fake_gemini(overrides=None, **model_options):
+    """
+    Route `genai.GenerativeModel` to `FakeGenerativeModel`; yields the list of created fakes
+
+    `overrides` maps model names to options replacing `model_options`, so
+    fakes of differing speeds can stand in for different models.
+    """
+    import google.generativeai as genai
+    created = []
+
+    def factory(model_name, **kwargs):
+        model = FakeGenerativeModel(model_name, **{**model_options, **(overrides or {}).get(model_name, {})})
+        created.append(model)
+        return model
+
+    original = genai.GenerativeModel, genai.configure
+    genai.GenerativeModel = factory
+    genai.configure = lambda **kwargs: None
+    try:
+        yield created
+    finally:
+        genai.GenerativeModel, genai.configure = original
+
+
+def generate_corpus(size, unique_fraction=0.5, seed=0):
+    """Deterministic synthetic comments, about `unique_fraction` of them distinct"""
+    rng = random.Random(seed)
+    distinct = max(1, int(size * unique_fraction))
+    return [COMMENT_TEMPLATES[n % len(COMMENT_TEMPLATES)].format(n=n)
+            for n in (rng.randrange(distinct) for _ in range(size))]
+
+
+def write_corpus_file(comments, structure, directory):
+    """Write comments in one of the dashboard's upload formats and return the path"""
+    path = os.path.join(directory, f"corpus_{structure.replace(' ', '_').lower()}.csv")
+    with open(path, 'w', encoding='utf-8') as f:
+        if structure == "Standard CSV":
+            f.write("id,feedback\n")
+            f.writelines(f'{i},"{comment}"\n' for i, comment in enumerate(comments))
+        elif structure == "Comma Separated":
+            f.write(','.join(comment.replace(',', ';') for comment in comments))
+        else:
+            f.writelines(f"{comment}\n" for comment in comments)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summarize_runs(durations, size, extra):
+    return {
+        'comments_per_second': round(size / statistics.median(durations), 1),
+        'p50_seconds': round(percentile(durations, 0.5), 4),
+        'p95_seconds': round(percentile(durations, 0.95), 4),
+        'peak_rss_mb': peak_rss_mb(),
+        **extra,
+    }
+
+
+def bench_analyze(size, repeats, model_options, analyzer_options, router_options=None):
+    """
+    End-to-end `analyze_feedback` over a synthetic corpus of `size` comments
+
+    With `router_options`, requests go through a `ModelRouter` built with
+    `ModelRouter.from_names(model_name, **router_options)`.
+    """
+    from feedback_analyzer import FeedbackAnalyzer
+    from model_router import ModelRouter
+    comments = generate_corpus(size)
+    durations = []
+    router_stats = {}
+    with fake_gemini(**model_options) as created:
+        for _ in range(repeats):
+            first_model = len(created)
+            options = dict(analyzer_options)
+            if router_options:
+                router = ModelRouter.from_names(options['model_name'], **router_options)
+                options.update(model=router, model_name=router.model_name)
+            analyzer = FeedbackAnalyzer(api_key='fake', **options)
+            start = time.perf_counter()
+            insights = analyzer.analyze_feedback(comments)
+            durations.append(time.perf_counter() - start)
+            if router_options:
+                router_stats = {f"router_{key}": value for key, value in router.stats().items()}
+    # Counters of the last run (a router creates several models per run)
+    last_run = created[first_model:]
+    call_latencies = [latency for model in created for latency in model.call_latencies]
+    return _summarize_runs(durations, size, {
+        'prompt_tokens': sum(model.prompt_tokens for model in last_run),
+        'model_calls': sum(model.calls for model in last_run),
+        'model_errors': sum(model.errors for model in last_run),
+        'batch_count': insights['batch_count'],
+        'call_p50_seconds': round(percentile(call_latencies, 0.5), 4),
+        'call_p95_seconds': round(percentile(call_latencies, 0.95), 4),
+        **router_stats,
+    })
+
+
+def bench_ingest(size, repeats, structure):
+    """Parse an uploaded file with the dashboard's streaming reader"""
+    # feedback_ingest imports pandas lazily; load it up front so its import time (checked by --imports) isn't timed here
+    importlib.import_module('pandas')
+    from feedback_ingest import detect_encoding, iter_comments, read_csv_preview
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_corpus_file(generate_corpus(size), structure, directory)
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                encoding = detect_encoding(f)
+                if structure == "Standard CSV":
+                    read_csv_preview(f, encoding=encoding)
+                parsed = sum(1 for _ in iter_comments(f, structure, column='feedback', encoding=encoding))
+            durations.append(time.perf_counter() - start)
+    return _summarize_runs(durations, size, {'comments_parsed': parsed})
+
+
+def run_case(case):
+    """Run one benchmark case (called in a fresh worker process)"""
+    kind, size, options = case
+    if kind == 'analyze':
+        return bench_analyze(size, options['repeats'], options['model'], options['analyzer'], options.get('router'))
+    return bench_ingest(size, options['repeats'], options['structure'])
+
+
+def run_benchmarks(sizes, repeats, model_options, analyzer_options, include_ingest=True, router_options=None):
+    """Run every case in its own process and return {case name: metrics}"""
+    cases = {}
+    for size in sizes:
+        cases[f"analyze_feedback/{size}"] = ('analyze', size, {
+            'repeats': repeats, 'model': model_options, 'analyzer': analyzer_options, 'router': router_options,
+        })
+        if include_ingest:
+            for structure in INGEST_STRUCTURES:
+                cases[f"ingest/{structure}/{size}"] = ('ingest', size, {'repeats': repeats, 'structure': structure})
+
+    results = {}
+    context = get_context('spawn')
+    for name, case in cases.items():
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(run_case, case).result()
+        print(f"{name}: {json.dumps(results[name])}")
+    return results
+
+
+def measure_import(module, repeats=3):
+    """
+    Cold import cost of `module`, each time in a fresh interpreter
+
+    Returns:
+        (median cumulative import time in ms, `LAZY_DEPENDENCIES` it loaded)
+    """
+    timings = []
+    loaded = set()
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+        for line in completed.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if not match:
+                continue
+            cumulative, indent, name = match.groups()
+            if name in LAZY_DEPENDENCIES:
+                loaded.add(name)
+            if name == module and not indent:
+                timings.append(int(cumulative) / 1000)
+    return round(statistics.median(timings), 1), sorted(loaded)
+
+
+def check_imports(budgets=IMPORT_BUDGETS_MS, repeats=3):
+    """Measure every entry point's import and list budget overruns and eager heavy imports"""
+    problems = []
+    for module, budget in budgets.items():
+        milliseconds, loaded = measure_import(module, repeats)
+        print(f"import/{module}: {json.dumps({'import_ms': milliseconds, 'budget_ms': budget, 'loaded': loaded})}")
+        if milliseconds > budget:
+            problems.append(f"{module}: imports in {milliseconds} ms (budget {budget} ms)")
+        if loaded:
+            problems.append(f"{module}: eagerly imports {', '.join(loaded)}")
+    return problems
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """List regressions of more than `tolerance` (a fraction) against a baseline"""
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in BASELINE_METRICS.items():
+            if metric not in metrics or not previous.get(metric):
+                continue
+            change = (metrics[metric] - previous[metric]) / previous[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name} {metric}: {previous[metric]} -> {metrics[metric]} ({change:+.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer and upload parsing against a fake Gemini")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated corpus sizes (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per case (p50/p95 are over these)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake model latency per call in seconds")
+    parser.add_argument('--tokens-per-second', type=float, help="Fake output token throughput")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls failing with a 429")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="Fraction of calls with extra tail latency")
+    parser.add_argument('--tail-latency', type=float, default=0.0, help="Extra seconds for tail-latency calls")
+    parser.add_argument('--model', default='gemini-flash-latest', help="Model name the fake stands in for")
+    parser.add_argument('--strong-model', help="Route large/ambiguous batches to this (fake) model")
+    parser.add_argument('--strong-latency', type=float, help="Fake latency of the strong model (default: --latency)")
+    parser.add_argument('--hedge-after', type=float, help="Hedge requests slower than this many seconds")
+    parser.add_argument('--batch-tokens', type=int, help="Prompt token budget per batch")
+    parser.add_argument('--max-in-flight', type=int, help="Maximum concurrent model calls")
+    parser.add_argument('--skip-ingest', action='store_true', help="Only benchmark analyze_feedback")
+    parser.add_argument('--imports', action='store_true',
+                        help="Only check entry point import times against IMPORT_BUDGETS_MS")
+    parser.add_argument('--save-baseline', help="Write results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed regression as a fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.imports:
+        problems = check_imports(repeats=args.repeats)
+        if problems:
+            print("Import budget exceeded:", file=sys.stderr)
+            for problem in problems:
+                print(f"  {problem}", file=sys.stderr)
+            return 1
+        print("All entry points within their import budgets")
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    model_options = {'latency': args.latency, 'tokens_per_second': args.tokens_per_second,
+                     'error_rate': args.error_rate, 'tail_rate': args.tail_rate, 'tail_latency': args.tail_latency}
+    router_options = None
+    if args.strong_model or args.hedge_after:
+        router_options = {'strong_name': args.strong_model, 'hedge_after': args.hedge_after}
+        if args.strong_model and args.strong_latency is not None:
+            model_options['overrides'] = {args.strong_model: {'latency': args.strong_latency}}
+    # The model name only selects the context window used for batch sizing
+    analyzer_options = {'model_name': args.model}
+    if args.batch_tokens:
+        analyzer_options['batch_tokens'] = args.batch_tokens
+    if args.max_in_flight:
+        analyzer_options['max_in_flight'] = args.max_in_flight
+
+    results = run_benchmarks(sizes, args.repeats, model_options, analyzer_options, not args.skip_ingest,
+                             router_options)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'settings': {'repeats': args.repeats, **model_options, **analyzer_options, **(router_options or {})},
+        'results': results,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Performance regressions:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from insights_schema import PRIORITIES, SENTIMENTS
+
+SENTIMENT_DTYPE = pd.CategoricalDtype(list(SENTIMENTS))
+PRIORITY_DTYPE = pd.CategoricalDtype(list(reversed(PRIORITIES)), ordered=True)
+
+
+def _links(records, position):
+    """Long (label, name) table for the theme or issue names at `position` of each record"""
+    pairs = [(i, name) for i, record in enumerate(records) for name in record[position]]
+    names = [name for _, name in pairs]
+    return pd.DataFrame({
+        'label': np.array([i for i, _ in pairs], dtype='int64'),
+        'name': pd.Categorical(names, categories=list(dict.fromkeys(names))),
+    })
+
+
+class CommentLabels:
+    def __init__(self, frame, labels, theme_links, issue_links, issue_priority, stats=None):
+        """
+        Per-comment labels whose aggregates are computed locally
+
+        `labels` has one row per distinct labeled comment with a categorical
+        `sentiment` column; `theme_links` and `issue_links` map label rows to
+        categorical theme/issue names (a comment can have several). `frame`
+        has one row per comment occurrence with its `weight`, its `label` row
+        and any extra columns (segment, date, ...) of the input DataFrame.
+
+        Slicing `frame` with `filter` and calling `aggregate` again needs no
+        model calls.
+        """
+        self.frame = frame
+        self.labels = labels
+        self.theme_links = theme_links
+        self.issue_links = issue_links
+        self.issue_priority = issue_priority
+        self.stats = stats or {}
+
+    @classmethod
+    def from_records(cls, frame, records, issue_priority, stats=None):
+        """
+        Build from plain Python labels
+
+        Args:
+            frame: DataFrame with 'comment', 'weight' and 'label' columns
+                (plus optional extra columns); 'label' indexes `records`
+            records: List of (comment, sentiment, theme names, issue names)
+            issue_priority: Dict of issue name -> high/medium/low
+            stats: Optional run statistics (batch count, cache hits, ...)
+        """
+        labels = pd.DataFrame({
+            'comment': [record[0] for record in records],
+            'sentiment': pd.Categorical([record[1] for record in records], dtype=SENTIMENT_DTYPE),
+        })
+        theme_links = _links(records, 2).rename(columns={'name': 'theme'})
+        issue_links = _links(records, 3).rename(columns={'name': 'issue'})
+        frame = frame.assign(sentiment=pd.Categorical.from_codes(
+            labels['sentiment'].cat.codes.to_numpy()[frame['label'].to_numpy()], dtype=SENTIMENT_DTYPE
+        ))
+        return cls(frame, labels, theme_links, issue_links, issue_priority, stats)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def filter(self, mask):
+        """Labels restricted to the frame rows selected by a boolean mask"""
+        return CommentLabels(self.frame[mask], self.labels, self.theme_links, self.issue_links,
+                             self.issue_priority, self.stats)
+
+    def themes(self):
+        """Theme names in first-seen order"""
+        return list(self.theme_links['theme'].cat.categories)
+
+    def issues(self):
+        """Issue names in first-seen order"""
+        return list(self.issue_links['issue'].cat.categories)
+
+    def _label_weights(self):
+        """Total frame weight of every label row"""
+        return np.bincount(self.frame['label'].to_numpy(), weights=self.frame['weight'].to_numpy(),
+                           minlength=len(self.labels)).astype('int64')
+
+    def _weighted_links(self, links, weights):
+        label_codes = links['label'].to_numpy()
+        return links.assign(
+            weight=weights[label_codes],
+            sentiment=pd.Categorical.from_codes(self.labels['sentiment'].cat.codes.to_numpy()[label_codes],
+                                                dtype=SENTIMENT_DTYPE)
+        )
+
+    def aggregate(self):
+        """
+        Compute the count fields of an insights dictionary from the labels
+
+        Returns:
+            Insights dictionary with sentimentDistribution, topThemes,
+            criticalIssues and comment_count (summary, recommendations and
+            trendingTopics are left empty)
+        """
+        weights = self._label_weights()
+        sentiments = self.frame.groupby('sentiment', observed=False)['weight'].sum()
+
+        themes = self._weighted_links(self.theme_links, weights)
+        by_theme = themes.groupby(['theme', 'sentiment'], observed=False)['weight'].sum().unstack(fill_value=0)
+        counts = by_theme.sum(axis=1)
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        dominant = by_theme.loc[counts.index].idxmax(axis=1)
+
+        issues = self._weighted_links(self.issue_links, weights)
+        mentions = issues.groupby('issue', observed=True)['weight'].sum()
+        issue_table = pd.DataFrame({
+            'issue': mentions.index.astype(str),
+            'priority': pd.Categorical([self.issue_priority.get(issue, 'medium') for issue in mentions.index],
+                                       dtype=PRIORITY_DTYPE),
+            'mentions': mentions.to_numpy(),
+        })
+        issue_table = issue_table[issue_table['mentions'] > 0].sort_values(
+            ['priority', 'mentions'], ascending=[False, False], kind='stable'
+        )
+
+        return {
+            'sentimentDistribution': [{'name': name.capitalize(), 'value': int(value)}
+                                      for name, value in sentiments.items()],
+            'topThemes': [{'theme': theme, 'count': int(count), 'sentiment': dominant[theme]}
+                          for theme, count in counts.items()],
+            'criticalIssues': [{'issue': issue, 'priority': str(priority), 'mentions': int(count)}
+                               for issue, priority, count in issue_table.itertuples(index=False)],
+            'trendingTopics': [],
+            'summary': '',
+            'recommendations': [],
+            'comment_count': int(self.frame['weight'].sum()),
+        }
+
+    def groupby(self, by):
+        """Aggregate separately for each value of a frame column (e.g. a segment column)"""
+        groups = {}
+        # Group rows by position, since the frame keeps the input DataFrame's index (which may repeat)
+        for key, positions in self.frame.groupby(by, observed=True).indices.items():
+            mask = np.zeros(len(self.frame), dtype=bool)
+            mask[positions] = True
+            groups[key] = self.filter(mask).aggregate()
+        return groups
+
+    def compare(self, by, baseline=None):
+        """
+        Side-by-side aggregates for the groups of a frame column (e.g. version or region)
+
+        Shares are percentages of each group's comments; deltas are
+        percentage points against the `baseline` group or, by default,
+        against all comments. Rows without a group value are left out.
+
+        Returns:
+            Dict of DataFrames: 'comments' (comments per group), 'sentiment'
+            and 'sentiment_delta' (group x sentiment), 'themes' and
+            'theme_delta' (theme x group, largest spread between groups
+            first) and 'unique_issues' (issues mentioned in one group only)
+        """
+        frame = self.frame
+        totals = frame.groupby(by, observed=True)['weight'].sum()
+        totals = totals[totals > 0]
+        if baseline is not None and baseline not in totals.index:
+            raise ValueError(f"Baseline group '{baseline}' not found in column '{by}'")
+        groups = totals.index
+
+        sentiment = frame.groupby([by, 'sentiment'], observed=True)['weight'].sum().unstack(fill_value=0)
+        sentiment = sentiment.reindex(index=groups, columns=SENTIMENT_DTYPE.categories, fill_value=0)
+        sentiment_share = sentiment.div(totals, axis=0) * 100
+        overall = sentiment.sum() / totals.sum() * 100
+        sentiment_delta = sentiment_share - (sentiment_share.loc[baseline] if baseline is not None else overall)
+
+        # Weight of every (label row, group) pair, so links are joined once per distinct comment
+        per_label = frame.groupby(['label', by], observed=True)['weight'].sum().reset_index()
+
+        def group_counts(links, column):
+            joined = links.merge(per_label, on='label')
+            counts = joined.groupby([column, by], observed=True)['weight'].sum().unstack(fill_value=0)
+            return counts.reindex(columns=groups, fill_value=0)
+
+        theme_counts = group_counts(self.theme_links, 'theme')
+        theme_share = theme_counts.div(totals, axis=1) * 100
+        reference = theme_share[baseline] if baseline is not None else theme_counts.sum(axis=1) / totals.sum() * 100
+        spread = (theme_share.max(axis=1) - theme_share.min(axis=1)).sort_values(ascending=False, kind='stable')
+        theme_share = theme_share.loc[spread.index]
+        theme_delta = theme_share.sub(reference.loc[spread.index], axis=0)
+
+        issue_counts = group_counts(self.issue_links, 'issue')
+        single = issue_counts[(issue_counts > 0).sum(axis=1) == 1]
+        unique_issues = pd.DataFrame({
+            by: single.idxmax(axis=1).to_numpy(),
+            'issue': single.index.astype(str),
+            'priority': pd.Categorical([self.issue_priority.get(issue, 'medium') for issue in single.index],
+                                       dtype=PRIORITY_DTYPE),
+            'mentions': single.max(axis=1).to_numpy().astype('int64'),
+        }).sort_values(['priority', 'mentions'], ascending=[False, False], kind='stable', ignore_index=True)
+
+        return {
+            'comments': totals.astype('int64'),
+            'sentiment': sentiment_share,
+            'sentiment_delta': sentiment_delta,
+            'themes': theme_share,
+            'theme_delta': theme_delta,
+            'unique_issues': unique_issues,
+        }
+
+    def select(self, sentiment=None, theme=None, issue=None):
+        """Labels of the comments with the given sentiment and/or mentioning a theme or issue"""
+        mask = np.ones(len(self.frame), dtype=bool)
+        label_codes = self.frame['label'].to_numpy()
+        if sentiment is not None:
+            mask &= (self.frame['sentiment'] == sentiment).to_numpy()
+        if theme is not None:
+            matching = self.theme_links.loc[self.theme_links['theme'] == theme, 'label'].to_numpy()
+            mask &= np.isin(label_codes, matching)
+        if issue is not None:
+            matching = self.issue_links.loc[self.issue_links['issue'] == issue, 'label'].to_numpy()
+            mask &= np.isin(label_codes, matching)
+        return self.filter(mask)
+
+    def _joined_names(self, links, column):
+        names = links[column].astype(str).groupby(links['label']).agg(', '.join)
+        return self.frame['label'].map(names).fillna('')
+
+    def to_frame(self):
+        """Frame rows with their sentiment, themes and issues as readable columns"""
+        frame = self.frame.drop(columns=['label'])
+        frame['themes'] = self._joined_names(self.theme_links, 'theme')
+        frame['issues'] = self._joined_names(self.issue_links, 'issue')
+        return frame
+
+    def to_records(self):
+        """One dict per distinct comment, as accepted by `ResultStore.record_run`"""
+        themes = self.theme_links['theme'].astype(str).groupby(self.theme_links['label']).agg(list)
+        used = self.labels.iloc[np.unique(self.frame['label'].to_numpy())]
+        return [{'comment': comment, 'sentiment': sentiment, 'themes': themes.get(i, [])}
+                for i, comment, sentiment in zip(used.index, used['comment'], used['sentiment'])]
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+SENTIMENT_COLORS = {'Positive': '#10b981', 'Negative': '#ef4444', 'Neutral': '#6b7280'}
+THEME_COLORS = {'positive': '#10b981', 'negative': '#ef4444', 'neutral': '#6b7280'}
+
+# Themes shown in the chart and report
+TOP_THEMES = 5
+
+# Critical issues rendered as cards; the rest go into a table
+MAX_ISSUE_CARDS = 20
+
+# Themes (largest spread between groups first) shown in the comparison heatmap
+TOP_COMPARED_THEMES = 15
+
+# Built figures/exports kept in memory (a handful per analysis)
+MEMO_ENTRIES = 128
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def insights_fingerprint(insights):
+    """Stable hash of an insights dictionary"""
+    payload = json.dumps(insights, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def memoized(builder, insights, fingerprint):
+    """Return `builder(insights)`, building it only once per insights fingerprint"""
+    key = (builder.__name__, fingerprint)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    value = builder(insights)
+    with _memo_lock:
+        _memo[key] = value
+        while len(_memo) > MEMO_ENTRIES:
+            _memo.popitem(last=False)
+    return value
+
+
+def build_sentiment_figure(insights):
+    """Pie chart of the sentiment distribution"""
+    # pandas and plotly are imported on first use so the page can start rendering sooner
+    import pandas as pd
+    import plotly.express as px
+    sentiment_df = pd.DataFrame(insights['sentimentDistribution'])
+    return px.pie(sentiment_df, values='value', names='name',
+                  color='name',
+                  color_discrete_map=SENTIMENT_COLORS)
+
+
+def build_themes_figure(insights):
+    """Bar chart of the top themes"""
+    import pandas as pd
+    import plotly.express as px
+    themes_df = pd.DataFrame(insights['topThemes'][:TOP_THEMES])
+    fig = px.bar(themes_df, x='theme', y='count',
+                 color='sentiment',
+                 color_discrete_map=THEME_COLORS)
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+
+def build_group_sentiment_figure(comparison):
+    """Grouped bar chart of each group's sentiment shares"""
+    import pandas as pd
+    import plotly.express as px
+    shift_df = pd.DataFrame(comparison['sentimentShift'])
+    fig = px.bar(shift_df, x='group', y='share', color='sentiment', barmode='group',
+                 color_discrete_map=SENTIMENT_COLORS, labels={'share': '% of comments'})
+    return fig
+
+
+def build_theme_delta_figure(comparison):
+    """Heatmap of theme share deltas (percentage points) per group"""
+    import pandas as pd
+    import plotly.express as px
+    themes = comparison['themeDeltas'][:TOP_COMPARED_THEMES]
+    deltas = pd.DataFrame([theme['deltas'] for theme in themes], index=[theme['theme'] for theme in themes])
+    fig = px.imshow(deltas, text_auto='.1f', aspect='auto', color_continuous_scale='RdBu_r',
+                    color_continuous_midpoint=0, labels={'color': 'Δ pp'})
+    return fig
+
+
+def build_issues_table(insights):
+    """Critical issues beyond the rendered cards, as a DataFrame"""
+    import pandas as pd
+    return pd.DataFrame(insights['criticalIssues'][MAX_ISSUE_CARDS:], columns=['issue', 'priority', 'mentions'])
+
+
+def build_insights_json(insights):
+    """JSON export payload"""
+    return json.dumps(insights, indent=2)
+
+
+def build_comparison_json(comparison):
+    """JSON export payload of a group comparison"""
+    return json.dumps(comparison, indent=2)
+
+
+def build_text_report(insights):
+    """Plain-text report export payload"""
+    return f"""FEEDBACK ANALYSIS REPORT
+Generated: {insights.get('generated_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}
+Model: {insights.get('model_used', 'Unknown')}
+Execution Time: {insights.get('execution_time', '0')}s
+
+SUMMARY:
+{insights['summary']}
+
+SENTIMENT DISTRIBUTION:
+{chr(10).join([f"- {s['name']}: {s['value']}" for s in insights['sentimentDistribution']])}
+
+TOP THEMES:
+{chr(10).join([f"{i+1}. {t['theme']} ({t['count']} mentions)" for i, t in enumerate(insights['topThemes'][:TOP_THEMES])])}
+
+CRITICAL ISSUES:
+{chr(10).join([f"- [{i['priority'].upper()}] {i['issue']} ({i['mentions']} mentions)" for i in insights['criticalIssues']])}
+
+RECOMMENDATIONS:
+{chr(10).join([f"{i+1}. {r}" for i, r in enumerate(insights['recommendations'])])}
+"""
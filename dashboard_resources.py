@@ -0,0 +1,170 @@
+import hashlib
+import importlib
+import os
+import streamlit as st
+from feedback_analyzer import FeedbackAnalyzer
+from instrumentation import Instrumentation, json_lines_exporter, serve_prometheus
+from job_queue import DEFAULT_JOB_WORKERS, JobQueue
+from response_cache import ResponseCache
+from result_store import ResultStore
+
+# How long a fetched model list is reused before asking the API again
+MODEL_LIST_TTL_SECONDS = 600
+
+# How long history queries are reused (recording a run clears them immediately)
+HISTORY_TTL_SECONDS = 300
+
+# Upper bound on pooled analyzers (one per key/model/option combination)
+MAX_POOLED_ANALYZERS = 32
+
+
+def key_fingerprint(api_key):
+    """Short hash of an API key, so the key itself is never used as a cache key"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+@st.cache_resource
+def get_response_cache():
+    """Response cache shared across reruns and sessions (disk tier opt-in via FEEDBACK_CACHE_DB)"""
+    return ResponseCache(disk_path=os.environ.get('FEEDBACK_CACHE_DB'), ttl_seconds=24 * 3600)
+
+
+@st.cache_resource
+def get_instrumentation():
+    """
+    Metrics shared by all pooled analyzers
+
+    Set FEEDBACK_METRICS_LOG to append every span to a JSON-lines file and
+    FEEDBACK_METRICS_PORT to serve Prometheus text metrics on that port.
+    """
+    exporters = []
+    if os.environ.get('FEEDBACK_METRICS_LOG'):
+        exporters.append(json_lines_exporter(os.environ['FEEDBACK_METRICS_LOG']))
+    instrumentation = Instrumentation(exporters)
+    if os.environ.get('FEEDBACK_METRICS_PORT'):
+        serve_prometheus(instrumentation, int(os.environ['FEEDBACK_METRICS_PORT']))
+    return instrumentation
+
+
+@st.cache_resource
+def get_result_store():
+    """Run history database (location set via FEEDBACK_HISTORY_DB)"""
+    return ResultStore(os.environ.get('FEEDBACK_HISTORY_DB', 'insights_history.sqlite'))
+
+
+@st.cache_data(ttl=HISTORY_TTL_SECONDS, show_spinner=False)
+def load_theme_trends(start, end, model, freq):
+    """Cached `ResultStore.theme_trends` for the history view"""
+    return get_result_store().theme_trends(start, end, model, freq)
+
+
+@st.cache_data(ttl=HISTORY_TTL_SECONDS, show_spinner=False)
+def load_sentiment_drift(start, end, model, freq):
+    """Cached `ResultStore.sentiment_drift` for the history view"""
+    return get_result_store().sentiment_drift(start, end, model, freq)
+
+
+@st.cache_resource
+def get_job_queue():
+    """
+    Background analysis jobs shared by all sessions
+
+    Set FEEDBACK_JOBS_DB to move the job table (default: feedback_jobs.sqlite)
+    and FEEDBACK_JOB_WORKERS to change how many analyses run at once.
+    pandas is imported here, before any worker starts: workers importing it
+    for the first time at once can see a partially initialized module.
+    """
+    importlib.import_module('pandas')
+    return JobQueue(os.environ.get('FEEDBACK_JOBS_DB', 'feedback_jobs.sqlite'),
+                    max_workers=int(os.environ.get('FEEDBACK_JOB_WORKERS', DEFAULT_JOB_WORKERS)))
+
+
+def run_analysis_job(context, analyzer, feedback, per_comment=False, history=None, group_by=None):
+    """
+    Job body for one dashboard analysis (run by `get_job_queue()`)
+
+    Streamed insights sections are published as they arrive, so polling
+    sessions can show them before the run finishes. Pass the
+    `get_result_store()` store as `history` to record the run; cached
+    resources are looked up by the submitting script, not the worker thread.
+    With `group_by`, `feedback` is a function returning a DataFrame (feedback
+    column first) whose groups are compared with `compare_groups`.
+
+    Returns:
+        Dict with 'insights', 'labels' (`CommentLabels` or None),
+        'comparison' (or None) and 'metrics' (instrumentation snapshot of this run only)
+    """
+    # Pooled analyzers share one Instrumentation; the run gets its own, feeding the shared totals
+    run_metrics = Instrumentation(parent=analyzer.instrumentation)
+    analyzer = analyzer.with_instrumentation(run_metrics)
+    labels = None
+    comparison = None
+    if group_by:
+        frame = feedback()
+        comparison = analyzer.compare_groups(frame, group_by, column=frame.columns[0], progress=context.progress)
+        labels = comparison.pop('labels')
+        insights = comparison['overall']
+    elif per_comment:
+        labels = analyzer.label_feedback(feedback, progress=context.progress)
+        insights = analyzer.summarize_labels(labels)
+    else:
+        for section, value in analyzer.analyze_feedback_stream(feedback, progress=context.progress):
+            if section == 'insights':
+                insights = value
+            else:
+                context.publish(section, value)
+    if history is not None:
+        record_history(insights, labels.to_records() if labels else None, history)
+    return {
+        'insights': insights,
+        'labels': labels,
+        'comparison': comparison,
+        'metrics': run_metrics.snapshot(),
+    }
+
+
+def record_history(insights, comment_labels=None, store=None):
+    """Append a finished analysis to the history (default: `get_result_store()`) and refresh history queries"""
+    (store or get_result_store()).record_run(insights, comment_labels)
+    load_theme_trends.clear()
+    load_sentiment_drift.clear()
+
+
+# Arguments starting with an underscore are not hashed by Streamlit
+@st.cache_data(ttl=MODEL_LIST_TTL_SECONDS, show_spinner=False)
+def _list_models(fingerprint, _api_key):
+    return FeedbackAnalyzer.list_available_models(_api_key)
+
+
+def list_models(api_key):
+    """Available models for an API key, fetched at most once per TTL"""
+    return _list_models(key_fingerprint(api_key), api_key)
+
+
+@st.cache_resource(max_entries=MAX_POOLED_ANALYZERS, show_spinner=False)
+def _get_analyzer(fingerprint, model_name, use_local_fast_path, use_clustering, strong_model, hedge_after, _api_key):
+    return FeedbackAnalyzer.from_options(
+        _api_key, model_name, strong_model=strong_model, hedge_after=hedge_after,
+        local_fast_path=use_local_fast_path, cluster=use_clustering,
+        cache=get_response_cache(), instrumentation=get_instrumentation()
+    )
+
+
+def get_analyzer(api_key, model_name, use_local_fast_path=False, use_clustering=False, strong_model=None,
+                 hedge_after=None):
+    """
+    Pooled analyzer for the given key, model and options
+
+    With `strong_model` and/or `hedge_after`, requests go through a
+    `ModelRouter` over `model_name` and `strong_model`. Every model of a
+    pooled analyzer is bound to a client for its own key, so sessions with
+    different keys never share credentials through the SDK's global config.
+    """
+    return _get_analyzer(key_fingerprint(api_key), model_name, use_local_fast_path, use_clustering, strong_model,
+                         hedge_after, api_key)
+
+
+def clear_resources():
+    """Invalidate cached model lists and pooled analyzers"""
+    _list_models.clear()
+    _get_analyzer.clear()
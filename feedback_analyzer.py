@@ -1,23 +1,344 @@
-import google.generativeai as genai
+import copy
 import json
-import pandas as pd
+import os
+import re
+import sys
 from datetime import datetime
+import threading
 import time
+from collections import deque
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from insights_schema import (FIELD_DEFAULTS, FIELD_EXAMPLES, INSIGHT_FIELDS, LABEL_SCHEMA, StreamingJSONParser,
+                             extract_json, response_schema, validate_insights, validate_labels)
+from instrumentation import NullInstrumentation
+from local_classifier import LocalClassifier
+from model_router import ModelRouter
+from prompt_budget import CALIBRATION_SAMPLE_COMMENTS, PromptBudget
+from rate_limiter import RateLimiter, backoff_delay, is_retryable
+
+# Bump whenever the prompts below change so cached responses are invalidated
+PROMPT_VERSION = 4
+
+# Prompt token budget per batch; corpora larger than this are analyzed in chunks
+DEFAULT_BATCH_TOKENS = 30000
+
+# Maximum number of Gemini requests in flight at once
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# Retry attempts for throttled (429) or failed (5xx) requests
+DEFAULT_MAX_RETRIES = 5
+
+# Comments per labeling call, so the per-comment response stays within the output limit
+DEFAULT_LABEL_BATCH_COMMENTS = 150
+
+# Maximum number of batch summaries passed to the final reduce call
+MAX_REDUCE_SUMMARIES = 20
+
+ANALYSIS_PROMPT = """Analyze the following user feedback comments and provide insights in JSON format only (no markdown, no preamble):
+
+A trailing "(xN)" means the same comment was received N times; count it N times.
+
+Feedback:
+{feedback_text}
+
+Return a JSON object with this exact structure:
+{{
+  "sentimentDistribution": [
+    {{"name": "Positive", "value": <number>}},
+    {{"name": "Negative", "value": <number>}},
+    {{"name": "Neutral", "value": <number>}}
+  ],
+  "topThemes": [
+    {{"theme": "<theme name>", "count": <number>, "sentiment": "positive|negative|neutral"}}
+  ],
+  "criticalIssues": [
+    {{"issue": "<brief issue>", "priority": "high|medium|low", "mentions": <number>}}
+  ],
+  "trendingTopics": [
+    {{"topic": "<topic>", "mentions": <number>}}
+  ],
+  "summary": "<brief 2-3 sentence summary>",
+  "recommendations": ["<action 1>", "<action 2>", "<action 3>"]
+}}"""
+
+# Used with structured output: the response schema already spells out the JSON structure
+COMPACT_ANALYSIS_PROMPT = """Analyze these user feedback comments. Reply with JSON following the response schema: sentiment counts (Positive, Negative, Neutral), top themes with counts and sentiment, critical issues with priority and mentions, trending topics, a 2-3 sentence summary and 3 recommendations.
+A trailing "(xN)" means the same comment was received N times; count it N times.
+
+Feedback:
+{feedback_text}"""
+
+SUMMARY_PROMPT = """The following aggregated insights were computed from several batches of user feedback. Write one overall summary and recommendations in JSON format only (no markdown, no preamble):
+
+Aggregated insights:
+{aggregates}
+
+Batch summaries:
+{summaries}
+
+Return a JSON object with this exact structure:
+{{
+  "summary": "<brief 2-3 sentence summary>",
+  "recommendations": ["<action 1>", "<action 2>", "<action 3>"]
+}}"""
+
+FIELD_REPAIR_PROMPT = """Analyze the following user feedback comments and provide only these fields in JSON format only (no markdown, no preamble): {fields}
+
+A trailing "(xN)" means the same comment was received N times; count it N times.
+
+Feedback:
+{feedback_text}
+
+Return a JSON object with this exact structure:
+{{
+  {structure}
+}}"""
+
+LABEL_PROMPT = """Label each of the following user feedback comments in JSON format only (no markdown, no preamble).
+
+Each comment line starts with an id such as "[3]". First list the distinct themes and the issues needing attention across these comments, using short names. Then give every comment exactly one label with its sentiment and the 0-based indexes of the themes and issues it mentions.
+
+Feedback:
+{feedback_text}
+
+Return a JSON object with this exact structure:
+{{
+  "themes": ["<theme name>"],
+  "issues": [{{"issue": "<brief issue>", "priority": "high|medium|low"}}],
+  "labels": [{{"id": <comment id>, "sentiment": "positive|negative|neutral", "themes": [<theme index>], "issues": [<issue index>]}}]
+}}"""
+
+# Appended when comments are cluster representatives, so counts can be mapped back to cluster sizes
+CLUSTER_IDS_INSTRUCTIONS = """
+
+Each comment line starts with an id such as "[3]". In every topThemes and criticalIssues entry also include "ids": [<ids of the comments it covers>]."""
+
+# Count fields combined by merge_insights
+MERGED_FIELDS = ('sentimentDistribution', 'topThemes', 'criticalIssues', 'trendingTopics')
+
+PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+
+def _as_number(value):
+    """Coerce a count returned by the model into an int"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _dedupe_key(comment):
+    """Key under which near-duplicate comments (case, punctuation, spacing) collapse"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', comment.lower()).split())
+
+
+def _format_comment(comment, weight):
+    """Render a deduplicated comment for the prompt"""
+    return f"{comment} (x{weight})" if weight > 1 else comment
+
+
+def _apply_cluster_weights(insights, weights):
+    """Recompute theme counts and issue mentions from the cluster sizes of the cited ids"""
+    for items, field in ((insights.get('topThemes', []), 'count'), (insights.get('criticalIssues', []), 'mentions')):
+        for item in items:
+            ids = item.pop('ids', None)
+            if isinstance(ids, list) and ids:
+                item[field] = sum(weights.get(_as_number(i), 0) for i in set(ids))
+
+
+def _normalize_label(label):
+    """Normalize a theme/issue/topic label for merging"""
+    return ' '.join(str(label).lower().split())
+
+
+def merge_insights(insights_list):
+    """
+    Deterministically merge partial insights into one insights dictionary
+
+    Sentiment values, theme counts, issue mentions and topic mentions are
+    summed across partials; labels are matched case- and whitespace-
+    insensitively. The first partial's summary is kept and the other
+    summaries are collected under `_summaries` for an optional reduce step.
+
+    Args:
+        insights_list: Iterable of insights dictionaries with the standard schema
+
+    Returns:
+        Merged insights dictionary
+    """
+    sentiments = {}
+    themes = {}
+    issues = {}
+    topics = {}
+    recommendations = {}
+    summaries = []
+    comment_count = 0
+
+    for insights in insights_list:
+        comment_count += _as_number(insights.get('comment_count', 0))
+        summaries.extend(insights.get('_summaries') or [insights.get('summary', '')])
+
+        for sentiment in insights.get('sentimentDistribution', []):
+            name = str(sentiment['name']).capitalize()
+            sentiments[name] = sentiments.get(name, 0) + _as_number(sentiment['value'])
+
+        for theme in insights.get('topThemes', []):
+            key = _normalize_label(theme['theme'])
+            count = _as_number(theme['count'])
+            merged = themes.setdefault(key, {'theme': theme['theme'], 'count': 0,
+                                             'sentiment': theme.get('sentiment', 'neutral'), '_best': -1})
+            merged['count'] += count
+            # The sentiment reported alongside the largest count wins
+            if count > merged['_best']:
+                merged['_best'] = count
+                merged['sentiment'] = theme.get('sentiment', merged['sentiment'])
+
+        for issue in insights.get('criticalIssues', []):
+            key = _normalize_label(issue['issue'])
+            merged = issues.setdefault(key, {'issue': issue['issue'], 'priority': 'low', 'mentions': 0})
+            merged['mentions'] += _as_number(issue['mentions'])
+            priority = str(issue.get('priority', 'low')).lower()
+            if PRIORITY_RANK.get(priority, 0) > PRIORITY_RANK[merged['priority']]:
+                merged['priority'] = priority
+
+        for topic in insights.get('trendingTopics', []):
+            key = _normalize_label(topic['topic'])
+            merged = topics.setdefault(key, {'topic': topic['topic'], 'mentions': 0})
+            merged['mentions'] += _as_number(topic['mentions'])
+
+        for rec in insights.get('recommendations', []):
+            key = _normalize_label(rec)
+            if key not in recommendations:
+                recommendations[key] = [rec, 0]
+            recommendations[key][1] += 1
+
+    for theme in themes.values():
+        del theme['_best']
+
+    # Stable sorts keep first-seen order for ties, so the merge is deterministic
+    ordered_sentiments = [name for name in ('Positive', 'Negative', 'Neutral') if name in sentiments]
+    ordered_sentiments += [name for name in sentiments if name not in ordered_sentiments]
+
+    return {
+        'sentimentDistribution': [{'name': name, 'value': sentiments[name]} for name in ordered_sentiments],
+        'topThemes': sorted(themes.values(), key=lambda t: -t['count']),
+        'criticalIssues': sorted(issues.values(), key=lambda i: (-PRIORITY_RANK[i['priority']], -i['mentions'])),
+        'trendingTopics': sorted(topics.values(), key=lambda t: -t['mentions']),
+        'summary': summaries[0] if summaries else '',
+        'recommendations': [rec for rec, _ in sorted(recommendations.values(), key=lambda r: -r[1])][:5],
+        'comment_count': comment_count,
+        '_summaries': summaries,
+    }
+
+
+def gemini_model(model_name, api_key=None):
+    """
+    Gemini model bound to its own client for `api_key`
+
+    A plain `genai.GenerativeModel` takes its client (and key) from the global
+    `genai.configure` state on its first call, so models shared between
+    sessions with different keys would use whichever key was configured last.
+    Without `api_key` the model keeps that default behaviour.
+    """
+    # The Gemini SDK takes about a second to import, so it is loaded only when needed
+    import google.generativeai as genai
+    model = genai.GenerativeModel(model_name)
+    if api_key is not None:
+        from google.ai import generativelanguage as glm
+        model._client = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+    return model
+
 
 class FeedbackAnalyzer:
-    def __init__(self, api_key, model_name='gemini-flash-latest'):
-        """Initialize the analyzer with your Gemini API key and model name"""
-        genai.configure(api_key=api_key)
+    def __init__(self, api_key, model_name='gemini-flash-latest', batch_tokens=DEFAULT_BATCH_TOKENS,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=DEFAULT_MAX_RETRIES, model=None, cache=None, local_classifier=None,
+                 clusterer=None, structured_output=True, instrumentation=None, prompt_budget=None):
+        """
+        Initialize the analyzer with your Gemini API key and model name
+
+        `max_in_flight` caps concurrent Gemini requests across all calls on
+        this analyzer, and `requests_per_minute`/`tokens_per_minute` throttle
+        them to the account quota. Pass `model` to use any object with a
+        `generate_content(prompt)` method (e.g. a local fake, or a `ModelRouter`
+        spreading batches over several models) instead of Gemini.
+        Pass a `ResponseCache` as `cache` to reuse results for repeated batches,
+        and a `LocalClassifier` as `local_classifier` to label easy comments
+        locally instead of sending them to the model. Pass a `FeedbackClusterer`
+        as `clusterer` to prompt only one representative per cluster of similar
+        comments; theme and issue counts are mapped back to the cluster sizes.
+        With `structured_output`, Gemini is asked for schema-conforming JSON and
+        only fields that fail validation are requested again. Pass an
+        `Instrumentation` to record stage timings, token usage and retries.
+        `prompt_budget` (a `PromptBudget`, by default one for `model_name`)
+        compacts comments and caps batches to the model's context window.
+        """
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        if model is None:
+            model = gemini_model(model_name, api_key)
+        self.model = model
+        self.batch_tokens = batch_tokens
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.cache = cache
+        self.local_classifier = local_classifier
+        self.clusterer = clusterer
+        self.structured_output = structured_output
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self.prompt_budget = prompt_budget or PromptBudget(
+            model_name, window=getattr(model, 'context_window', None), count_tokens=getattr(model, 'count_tokens', None)
+        )
     
+    @classmethod
+    def from_options(cls, api_key, model_name='gemini-flash-latest', strong_model=None, hedge_after=None,
+                     local_fast_path=False, cluster=False, **options):
+        """
+        Analyzer for the dashboard's and batch runner's model options
+
+        With `strong_model` and/or `hedge_after`, requests go through a
+        `ModelRouter` over `model_name` and `strong_model`, recording to the
+        same `instrumentation` as the analyzer. `local_fast_path` adds a
+        `LocalClassifier` and `cluster` a `FeedbackClusterer`; any other
+        keyword arguments are passed to the constructor.
+        """
+        router = None
+        if strong_model or hedge_after:
+            router = ModelRouter.from_names(model_name, strong_model, api_key=api_key, hedge_after=hedge_after,
+                                            instrumentation=options.get('instrumentation'))
+        clusterer = None
+        if cluster:
+            # numpy is only loaded when clustering
+            from feedback_clustering import FeedbackClusterer
+            clusterer = FeedbackClusterer()
+        return cls(
+            api_key=api_key, model_name=router.model_name if router else model_name, model=router,
+            local_classifier=LocalClassifier() if local_fast_path else None, clusterer=clusterer, **options
+        )
+
+    def with_instrumentation(self, instrumentation):
+        """
+        Copy of this analyzer recording to `instrumentation`
+
+        The copy shares the model, cache, rate limiter and in-flight limit, so
+        a pooled analyzer can measure a single run without counting other
+        sessions' runs (pass an `Instrumentation` with this analyzer's as
+        `parent` to keep the shared totals).
+        """
+        analyzer = copy.copy(self)
+        analyzer.instrumentation = instrumentation
+        return analyzer
+
     @staticmethod
     def list_available_models(api_key):
         """List available Gemini models for the given API key"""
-        genai.configure(api_key=api_key)
+        import google.generativeai as genai
+        from google.ai import generativelanguage as glm
         models = []
         try:
-            for m in genai.list_models():
+            for m in genai.list_models(client=glm.ModelServiceClient(client_options={'api_key': api_key})):
                 if 'generateContent' in m.supported_generation_methods:
                     models.append(m.name.replace('models/', ''))
         except Exception as e:
@@ -25,75 +346,854 @@ class FeedbackAnalyzer:
             return ['gemini-flash-latest'] # Fallback
         return models
     
-    def analyze_feedback(self, feedback_list):
+    def analyze_feedback(self, feedback_list, batch_tokens=None, progress=None):
         """
         Analyze a list of feedback comments using Gemini
-        
+
+        Comments are packed into batches of roughly `batch_tokens` prompt
+        tokens. A corpus that fits in one batch is analyzed with a single
+        call; larger corpora are analyzed batch by batch and the partial
+        results are merged into one insights dictionary (map-reduce).
+
         Args:
-            feedback_list: List of feedback strings or a pandas DataFrame
-        
+            feedback_list: Feedback as a newline-separated string, list, iterator,
+                pandas Series or DataFrame (see `normalize_feedback`)
+            batch_tokens: Approximate prompt token budget per batch
+                (defaults to the analyzer's `batch_tokens`)
+            progress: Optional callable `progress(done, total)` called after
+                each batch (`total` is None while batches are still being
+                read); an exception it raises aborts the analysis
+
         Returns:
             Dictionary containing insights
         """
-        # Convert DataFrame to list if needed
+        start_time = time.time()
+        return self._analyze_comments(self._normalize_input(feedback_list), batch_tokens, progress, start_time)
+
+    def _analyze_comments(self, comments, batch_tokens, progress, start_time):
+        """Map-reduce comments already returned by `normalize_feedback`"""
+        budget = self._batch_budget(batch_tokens, self._prompt_template())
+        comments, local_insights = self._prepare_comments(comments)
+        cache_stats = {'hits': 0, 'misses': 0}
+        merged, batch_count = self._map_batches(self._iter_batches(comments, budget), cache_stats, progress)
+        return self._finalize(merged, local_insights, batch_count, cache_stats, start_time)
+
+    def analyze_feedback_stream(self, feedback_list, batch_tokens=None, progress=None):
+        """
+        Analyze feedback like `analyze_feedback`, yielding sections as they are ready
+
+        When the corpus fits in one batch, the response is streamed from
+        Gemini and each top-level section (summary, sentimentDistribution,
+        topThemes, ...) is yielded as soon as it has been parsed. Larger
+        corpora are analyzed in batches and their merged sections are yielded
+        once the merge completes.
+
+        Args:
+            feedback_list: Feedback in any form accepted by `analyze_feedback`
+            batch_tokens: Approximate prompt token budget per batch
+            progress: Optional per-batch callback (see `analyze_feedback`);
+                a single streamed batch also calls it for every chunk, so
+                raising from it cancels the stream
+
+        Yields:
+            (section name, value) tuples, ending with ('insights', full insights dictionary)
+        """
+        budget = self._batch_budget(batch_tokens, self._prompt_template())
+        start_time = time.time()
+
+        comments, local_insights = self._prepare_comments(self._normalize_input(feedback_list))
+        cache_stats = {'hits': 0, 'misses': 0}
+        batches = self._iter_batches(comments, budget)
+        first = next(batches, None)
+        second = next(batches, None) if first is not None else None
+
+        if first is not None and second is None:
+            merged = {}
+            for field, value in self._stream_batch(first, cache_stats, progress):
+                merged[field] = value
+                if local_insights is not None and field in MERGED_FIELDS:
+                    value = merge_insights([{field: value}, local_insights])[field]
+                yield field, value
+            merged['comment_count'] = sum(weight for _, weight in first)
+            if progress is not None:
+                progress(1, 1)
+            insights = self._finalize(merged, local_insights, 1, cache_stats, start_time)
+        else:
+            batches = chain([batch for batch in (first, second) if batch is not None], batches)
+            merged, batch_count = self._map_batches(batches, cache_stats, progress)
+            insights = self._finalize(merged, local_insights, batch_count, cache_stats, start_time)
+            for field in INSIGHT_FIELDS:
+                yield field, insights[field]
+
+        yield 'insights', insights
+
+    def _normalize_input(self, feedback_list):
+        """`normalize_feedback`, timing a lazy source's reads as ingest"""
+        metrics = self.instrumentation
+        if hasattr(feedback_list, '__next__'):
+            # Time spent reading a lazy source (e.g. an uploaded file) is reported as ingest
+            feedback_list = metrics.timed_iter('ingest', feedback_list)
+        with metrics.span('normalize'):
+            return self.normalize_feedback(feedback_list)
+
+    def _prepare_comments(self, comments):
+        """Compact normalized comments and apply the optional local classifier and clusterer"""
+        metrics = self.instrumentation
+        comments = self._compact(comments)
+        local_insights = None
+        if self.local_classifier is not None:
+            with metrics.span('local_classify'):
+                comments, local_insights = self.local_classifier.split(comments)
+        if self.clusterer is not None:
+            with metrics.span('cluster'):
+                comments = self.clusterer.representatives(comments)
+        return comments, local_insights
+
+    def _compact(self, comments):
+        """Strip boilerplate from and truncate outlier comments for the prompt"""
+        with self.instrumentation.span('compact'):
+            self.prompt_budget.calibrate([comment for comment, _ in comments[:CALIBRATION_SAMPLE_COMMENTS]])
+            return [(self.prompt_budget.compact(comment), weight) for comment, weight in comments]
+
+    def _batch_budget(self, batch_tokens, template):
+        """Requested batch budget, capped to what fits the model's context window next to `template`"""
+        return self.prompt_budget.batch_tokens(batch_tokens or self.batch_tokens, self.prompt_budget.count(template))
+
+    def _prompt_template(self):
+        """Analysis prompt text around the comments, for budgeting"""
+        template = COMPACT_ANALYSIS_PROMPT if self.structured_output else ANALYSIS_PROMPT
+        return template + (CLUSTER_IDS_INSTRUCTIONS if self.clusterer is not None else '')
+
+    def _finalize(self, merged, local_insights, batch_count, cache_stats, start_time):
+        """Fold in local results, write the reduce summary and add run metadata"""
+        if local_insights is not None:
+            with self.instrumentation.span('merge'):
+                merged = local_insights if merged is None else merge_insights([merged, local_insights])
+        if merged is None:
+            raise ValueError("No feedback comments to analyze")
+
+        if batch_count > 1:
+            self._summarize_merged(merged, cache_stats)
+        merged.pop('_summaries', None)
+
+        execution_time = time.time() - start_time
+
+        # Add metadata
+        merged['model_used'] = self.model_name
+        merged['generated_at'] = datetime.now().isoformat()
+        merged['execution_time'] = round(execution_time, 2)
+        merged['batch_count'] = batch_count
+        if self.cache is not None:
+            merged['cache'] = cache_stats
+        if self.local_classifier is not None:
+            local_count = local_insights['comment_count'] if local_insights else 0
+            merged['local_count'] = local_count
+            merged['local_fraction'] = round(local_count / merged['comment_count'], 3) if merged['comment_count'] else 0.0
+
+        return merged
+
+    def analyze_incremental(self, previous_insights, new_feedback, batch_tokens=None):
+        """
+        Fold newly arrived comments into previously saved insights
+
+        Only `new_feedback` is sent to the model; its counts are added to the
+        stored aggregates so old comments never need to be re-read. When there
+        are no new comments the previous insights are returned unchanged,
+        apart from the run metadata (`new_comment_count` is 0).
+
+        Args:
+            previous_insights: Insights dictionary or path to a file written by `save_insights`
+            new_feedback: List of new feedback strings or a pandas DataFrame
+            batch_tokens: Approximate prompt token budget per batch
+
+        Returns:
+            Dictionary containing the updated insights
+        """
+        if isinstance(previous_insights, str):
+            previous_insights = self.load_insights(previous_insights)
+
+        start_time = time.time()
+        comments = self._normalize_input(new_feedback)
+        if not comments:
+            unchanged = dict(previous_insights)
+            unchanged['execution_time'] = round(time.time() - start_time, 2)
+            unchanged['batch_count'] = 0
+            unchanged['new_comment_count'] = 0
+            unchanged['previous_generated_at'] = previous_insights.get('generated_at')
+            return unchanged
+
+        delta = self._analyze_comments(comments, batch_tokens, None, start_time)
+        merged = self.combine_insights([previous_insights, delta])
+        merged['execution_time'] = delta['execution_time']
+        merged['batch_count'] = delta['batch_count']
+        merged['new_comment_count'] = delta.get('comment_count', 0)
+        merged['previous_generated_at'] = previous_insights.get('generated_at')
+        if 'cache' in merged:
+            merged['cache']['hits'] += delta.get('cache', {}).get('hits', 0)
+            merged['cache']['misses'] += delta.get('cache', {}).get('misses', 0)
+
+        return merged
+
+    def combine_insights(self, insights_list):
+        """
+        Merge finished insights (e.g. per-file results) into one report
+
+        Counts are merged with `merge_insights` and one small model call
+        writes the combined summary and recommendations.
+
+        Args:
+            insights_list: List of insights dictionaries
+
+        Returns:
+            Dictionary containing the combined insights
+        """
+        start_time = time.time()
+        cache_stats = {'hits': 0, 'misses': 0}
+        with self.instrumentation.span('merge'):
+            merged = merge_insights(insights_list)
+        self._summarize_merged(merged, cache_stats)
+        merged.pop('_summaries', None)
+
+        merged['model_used'] = self.model_name
+        merged['generated_at'] = datetime.now().isoformat()
+        merged['execution_time'] = round(time.time() - start_time, 2)
+        if self.cache is not None:
+            merged['cache'] = cache_stats
+
+        return merged
+
+    def analyze_many(self, datasets, batch_tokens=None):
+        """
+        Analyze several independent datasets concurrently
+
+        All datasets share this analyzer's in-flight cap and rate limits, so
+        their batches interleave to keep the quota busy.
+
+        Args:
+            datasets: List of feedback lists/DataFrames
+            batch_tokens: Approximate prompt token budget per batch
+
+        Returns:
+            List of insights dictionaries in the same order as `datasets`
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(datasets))) as pool:
+            futures = [pool.submit(self.analyze_feedback, data, batch_tokens) for data in datasets]
+            return [future.result() for future in futures]
+
+    def compare_groups(self, feedback_frame, by, baseline=None, column=None, batch_tokens=None, progress=None):
+        """
+        Analyze a DataFrame once and compare the groups of one of its columns
+
+        Every distinct comment is labeled once with `label_feedback`, so
+        duplicates across groups share one label and cached batches are
+        reused; group counts are then computed locally. The cost is one pass
+        over the data plus one small summary call per group, instead of one
+        full run per group (as with `analyze_many`).
+
+        Args:
+            feedback_frame: DataFrame with a feedback column and a `by` column
+            by: Column to group by (e.g. product version, region or channel); not the feedback column
+            baseline: Group value deltas are measured against (default: all comments)
+            column: Feedback column (default: 'feedback', else the first column)
+            batch_tokens: Approximate prompt token budget per batch
+            progress: Optional per-batch callback (see `analyze_feedback`)
+
+        Returns:
+            Comparison dictionary with 'overall' and per-group insights
+            ('groups'), 'sentimentShift' and 'themeDeltas' (shares in percent
+            and deltas in percentage points), 'uniqueIssues' and the
+            `CommentLabels` as 'labels'
+        """
+        if by not in feedback_frame.columns:
+            raise ValueError(f"Column '{by}' not found")
+        feedback_column = column or self._feedback_column(feedback_frame).name
+        if by in (feedback_column, 'feedback'):
+            # The comments themselves (and the 'feedback' name they are analyzed under) cannot be a grouping
+            raise ValueError(f"Cannot group by '{by}': choose a column other than the feedback column")
+        if column is not None and column != 'feedback':
+            feedback_frame = feedback_frame.drop(columns=['feedback'], errors='ignore').rename(
+                columns={column: 'feedback'})
+        labels = self.label_feedback(feedback_frame, batch_tokens, progress)
+        tables = labels.compare(by, baseline)
+        keys = list(tables['comments'].index)
+
+        group_values = labels.frame[by].to_numpy()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            overall = pool.submit(self.summarize_labels, labels)
+            groups = pool.map(lambda key: self.summarize_labels(labels.filter(group_values == key)), keys)
+            groups = {str(key): insights for key, insights in zip(keys, groups)}
+            overall = overall.result()
+
+        sentiment, sentiment_delta = tables['sentiment'], tables['sentiment_delta']
+        themes, theme_delta = tables['themes'], tables['theme_delta']
+        return {
+            'group_by': by,
+            'baseline': None if baseline is None else str(baseline),
+            'overall': overall,
+            'groups': groups,
+            'sentimentShift': [
+                {'group': str(key), 'sentiment': name.capitalize(), 'share': round(float(sentiment.at[key, name]), 1),
+                 'delta': round(float(sentiment_delta.at[key, name]), 1)}
+                for key in keys for name in sentiment.columns
+            ],
+            'themeDeltas': [
+                {'theme': str(theme),
+                 'shares': {str(key): round(float(themes.at[theme, key]), 1) for key in keys},
+                 'deltas': {str(key): round(float(theme_delta.at[theme, key]), 1) for key in keys}}
+                for theme in themes.index
+            ],
+            'uniqueIssues': [
+                {'group': str(key), 'issue': issue, 'priority': str(priority), 'mentions': int(mentions)}
+                for key, issue, priority, mentions in tables['unique_issues'].itertuples(index=False)
+            ],
+            'labels': labels,
+        }
+
+    def label_feedback(self, feedback_list, batch_tokens=None, progress=None):
+        """
+        Label every comment individually instead of asking for aggregate counts
+
+        Comments are sent in batches of at most `DEFAULT_LABEL_BATCH_COMMENTS`
+        and the model returns a compact label per comment (sentiment plus
+        indexes into the batch's theme and issue lists). Themes and issues are
+        matched across batches by name. Easy comments are labeled by the local
+        classifier when one is configured; the clusterer is not used, since
+        every comment needs its own label.
+
+        Args:
+            feedback_list: Feedback in any form accepted by `analyze_feedback`.
+                For a DataFrame, the result keeps one row per input row with
+                its other columns, so it can be sliced by segment or date.
+            batch_tokens: Approximate prompt token budget per batch
+            progress: Optional per-batch callback (see `analyze_feedback`)
+
+        Returns:
+            `CommentLabels`; call `aggregate()` for counts or
+            `summarize_labels()` for a full insights dictionary
+        """
+        import pandas as pd
+        from comment_labels import CommentLabels
+
+        budget = self._batch_budget(batch_tokens, LABEL_PROMPT)
+        start_time = time.time()
+        metrics = self.instrumentation
+        with metrics.span('normalize'):
+            comments = self.normalize_feedback(feedback_list)
+        if not comments:
+            raise ValueError("No feedback comments to analyze")
+
+        labels = {}
+        remaining = comments
+        if self.local_classifier is not None:
+            remaining = []
+            with metrics.span('local_classify'):
+                for comment, weight in comments:
+                    result = self.local_classifier.classify(comment)
+                    if result is None:
+                        remaining.append((comment, weight))
+                    else:
+                        labels[comment] = (result[0], result[1], [])
+        local_count = sum(weight for comment, weight in comments if comment in labels)
+
+        theme_names = {}
+        issue_names = {}
+        issue_priority = {}
+        cache_stats = {'hits': 0, 'misses': 0}
+        # Batches hold the compacted prompt text; `offset` maps them back to the original comments
+        batches = list(self._iter_batches(self._compact(remaining), budget, DEFAULT_LABEL_BATCH_COMMENTS))
+        offset = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            results = pool.map(self._label_batch, [[comment for comment, _ in batch] for batch in batches])
+            for done, (batch, (result, hit)) in enumerate(zip(batches, results), 1):
+                if progress is not None:
+                    try:
+                        progress(done, len(batches))
+                    except BaseException:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+                originals = remaining[offset:offset + len(batch)]
+                offset += len(batch)
+                cache_stats['hits' if hit else 'misses'] += 1
+                for name, priority in result['issues'].items():
+                    name = issue_names.setdefault(_normalize_label(name), name)
+                    if PRIORITY_RANK[priority] >= PRIORITY_RANK.get(issue_priority.get(name), -1):
+                        issue_priority[name] = priority
+                for (comment, _), (sentiment, themes, issues) in zip(originals, result['labels']):
+                    labels[comment] = (
+                        sentiment,
+                        list(dict.fromkeys(theme_names.setdefault(_normalize_label(t), t) for t in themes)),
+                        list(dict.fromkeys(issue_names[_normalize_label(i)] for i in issues)),
+                    )
+
+        codes = {}
+        records = []
+        for comment, _ in comments:
+            codes[_dedupe_key(comment) or comment] = len(records)
+            records.append((comment,) + labels[comment])
+
         if isinstance(feedback_list, pd.DataFrame):
-            if 'feedback' in feedback_list.columns:
-                feedback_text = '\n'.join(feedback_list['feedback'].tolist())
-            else:
-                feedback_text = '\n'.join(feedback_list.iloc[:, 0].tolist())
+            # One row per input comment, keeping the DataFrame's other columns for slicing
+            # Rows are selected by position, so a duplicate index (e.g. from `pd.concat`) is kept as is
+            column = self._feedback_column(feedback_list)
+            text = column.astype(str).str.strip().to_numpy()
+            present = column.notna().to_numpy() & (text != '')
+            text = text[present]
+            frame = feedback_list[present].drop(columns=[column.name]).assign(
+                comment=text, weight=1, label=[codes[_dedupe_key(c) or c] for c in text]
+            )
         else:
-            feedback_text = '\n'.join(feedback_list)
-        
-        # Create the analysis prompt
-        prompt = f"""Analyze the following user feedback comments and provide insights in JSON format only (no markdown, no preamble):
+            frame = pd.DataFrame({
+                'comment': [comment for comment, _ in comments],
+                'weight': [weight for _, weight in comments],
+                'label': range(len(comments)),
+            })
 
-Feedback:
-{feedback_text}
+        stats = {
+            'batch_count': len(batches),
+            'local_count': local_count,
+            'execution_time': round(time.time() - start_time, 2),
+        }
+        if self.cache is not None:
+            stats['cache'] = cache_stats
+        return CommentLabels.from_records(frame, records, issue_priority, stats)
 
-Return a JSON object with this exact structure:
-{{
-  "sentimentDistribution": [
-    {{"name": "Positive", "value": <number>}},
-    {{"name": "Negative", "value": <number>}},
-    {{"name": "Neutral", "value": <number>}}
-  ],
-  "topThemes": [
-    {{"theme": "<theme name>", "count": <number>, "sentiment": "positive|negative|neutral"}}
-  ],
-  "criticalIssues": [
-    {{"issue": "<brief issue>", "priority": "high|medium|low", "mentions": <number>}}
-  ],
-  "trendingTopics": [
-    {{"topic": "<topic>", "mentions": <number>}}
-  ],
-  "summary": "<brief 2-3 sentence summary>",
-  "recommendations": ["<action 1>", "<action 2>", "<action 3>"]
-}}"""
-        
-        # Call Gemini API
+    def summarize_labels(self, labels):
+        """
+        Turn `CommentLabels` (or a filtered slice of them) into an insights dictionary
+
+        Counts come from `labels.aggregate()`; one small model call writes
+        the summary and recommendations.
+        """
         start_time = time.time()
-        response = self.model.generate_content(prompt)
-        end_time = time.time()
-        execution_time = end_time - start_time
-        
-        # Parse the response
-        response_text = response.text
-        clean_response = response_text.replace('```json', '').replace('```', '').strip()
-        insights = json.loads(clean_response)
-        
-        # Add metadata
+        cache_stats = {'hits': 0, 'misses': 0}
+        with self.instrumentation.span('merge'):
+            insights = labels.aggregate()
+        self._summarize_merged(insights, cache_stats)
+
         insights['model_used'] = self.model_name
         insights['generated_at'] = datetime.now().isoformat()
-        insights['execution_time'] = round(execution_time, 2)
-        
+        insights['execution_time'] = round(labels.stats.get('execution_time', 0) + time.time() - start_time, 2)
+        insights['batch_count'] = labels.stats.get('batch_count', 0)
+        insights['per_comment'] = True
+        if self.cache is not None:
+            label_cache = labels.stats.get('cache', {})
+            insights['cache'] = {key: cache_stats[key] + label_cache.get(key, 0) for key in cache_stats}
+        if self.local_classifier is not None:
+            insights['local_count'] = labels.stats.get('local_count', 0)
+            insights['local_fraction'] = (round(insights['local_count'] / insights['comment_count'], 3)
+                                          if insights['comment_count'] else 0.0)
         return insights
-    
+
+    def _request_labels(self, lines, count):
+        """Call the model for per-comment labels of the numbered `lines`"""
+        with self.instrumentation.span('prompt_build'):
+            prompt = LABEL_PROMPT.format(feedback_text='\n'.join(lines))
+        config = None
+        if self.structured_output:
+            config = {'response_mime_type': 'application/json', 'response_schema': LABEL_SCHEMA}
+        response = self._generate(prompt, config)
+        with self.instrumentation.span('parse'):
+            try:
+                data = extract_json(response.text)
+            except ValueError as e:
+                print(f"Error parsing model response: {e}")
+                return {}, {}
+            return validate_labels(data, count)
+
+    def _label_batch(self, comments):
+        """Label one batch of comments; returns ({'labels', 'issues'}, cache_hit)"""
+        with self.instrumentation.span('prompt_build'):
+            lines = [f"[{i}] {comment}" for i, comment in enumerate(comments, 1)]
+
+        def compute():
+            labels, priorities = self._request_labels(lines, len(lines))
+            missing = [i for i in range(1, len(lines) + 1) if i not in labels]
+            if missing:
+                # Ask again for just the comments the response skipped, keeping their ids
+                retried, retried_priorities = self._request_labels([lines[i - 1] for i in missing], len(lines))
+                labels.update({i: label for i, label in retried.items() if i in missing})
+                priorities.update(retried_priorities)
+            missing = [i for i in range(1, len(lines) + 1) if i not in labels]
+            if len(missing) == len(lines):
+                raise ValueError("Model returned no usable labels")
+            if missing:
+                print(f"Could not label {len(missing)} comments; marking them neutral")
+            default = {'sentiment': 'neutral', 'themes': [], 'issues': []}
+            result = {
+                'labels': [[label['sentiment'], label['themes'], label['issues']]
+                           for label in (labels.get(i, default) for i in range(1, len(lines) + 1))],
+                'issues': priorities,
+            }
+            if missing:
+                result['_incomplete'] = True
+            return result
+
+        return self._cached_json(['labels'] + lines, compute)
+
+    def _map_batches(self, batches, cache_stats, progress=None):
+        """Analyze batches concurrently and merge results in batch order"""
+        def collect(partial):
+            cache_stats['hits' if partial.pop('_cache_hit', False) else 'misses'] += 1
+            return partial
+
+        batches = iter(batches)
+        first = next(batches, None)
+        if first is None:
+            return None, 0
+        second = next(batches, None)
+        if second is None:
+            merged = collect(self._analyze_batch(first))
+            if progress is not None:
+                progress(1, 1)
+            return merged, 1
+
+        merged = None
+        batch_count = 0
+        # Only a bounded window of batches is queued so memory stays flat
+        window = self.max_in_flight * 2
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            pending = deque([pool.submit(self._analyze_batch, first), pool.submit(self._analyze_batch, second)])
+            try:
+                for batch in batches:
+                    if len(pending) >= window:
+                        partial = collect(pending.popleft().result())
+                        with self.instrumentation.span('merge'):
+                            merged = partial if merged is None else merge_insights([merged, partial])
+                        batch_count += 1
+                        if progress is not None:
+                            progress(batch_count, None)
+                    pending.append(pool.submit(self._analyze_batch, batch))
+                total = batch_count + len(pending)
+                while pending:
+                    partial = collect(pending.popleft().result())
+                    with self.instrumentation.span('merge'):
+                        merged = partial if merged is None else merge_insights([merged, partial])
+                    batch_count += 1
+                    if progress is not None:
+                        progress(batch_count, total)
+            except BaseException:
+                # Don't start queued batches of an aborted run
+                for future in pending:
+                    future.cancel()
+                raise
+        return merged, batch_count
+
+    def normalize_feedback(self, feedback_list):
+        """
+        Turn any supported feedback input into deduplicated, weighted comments
+
+        Strings are split into lines, DataFrames use their 'feedback' column
+        (or the first column), and any other iterable is consumed lazily.
+        Comments are stripped, empty ones dropped, and exact or near-duplicates
+        (differing only in case, punctuation or spacing) are collapsed into
+        one entry whose weight counts the repeats.
+
+        Args:
+            feedback_list: str, list, iterator, pandas Series or DataFrame
+
+        Returns:
+            List of (comment, weight) tuples in first-seen order
+        """
+        # A DataFrame or Series means pandas is already loaded; plain inputs never import it
+        pd = sys.modules.get('pandas')
+        if pd is not None and isinstance(feedback_list, pd.DataFrame):
+            feedback_list = self._feedback_column(feedback_list)
+        if pd is not None and isinstance(feedback_list, pd.Series):
+            feedback_list = feedback_list.dropna()
+        elif isinstance(feedback_list, str):
+            feedback_list = feedback_list.splitlines()
+
+        unique = {}
+        for comment in feedback_list:
+            if comment is None:
+                continue
+            comment = str(comment).strip()
+            if not comment:
+                continue
+            key = _dedupe_key(comment) or comment
+            if key in unique:
+                unique[key][1] += 1
+            else:
+                unique[key] = [comment, 1]
+        return [(comment, weight) for comment, weight in unique.values()]
+
+    @staticmethod
+    def _feedback_column(frame):
+        """The 'feedback' column of a DataFrame, or its first column"""
+        if 'feedback' in frame.columns:
+            return frame['feedback']
+        return frame.iloc[:, 0]
+
+    def _iter_batches(self, comments, budget, max_comments=None):
+        """Group (comment, weight) pairs into batches that fit the token budget (and comment cap)"""
+        batch = []
+        batch_size = 0
+        for comment, weight in comments:
+            # +1 for the newline joining prompt lines
+            tokens = self.prompt_budget.count(_format_comment(comment, weight)) + 1
+            if batch and (batch_size + tokens > budget or len(batch) == max_comments):
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append((comment, weight))
+            batch_size += tokens
+        if batch:
+            yield batch
+
+    def _build_prompt(self, lines):
+        """Build the analysis prompt for a batch of formatted comment lines"""
+        template = COMPACT_ANALYSIS_PROMPT if self.structured_output else ANALYSIS_PROMPT
+        with self.instrumentation.span('prompt_build'):
+            return template.format(feedback_text='\n'.join(lines))
+
+    def _generation_config(self, fields=INSIGHT_FIELDS, with_ids=False):
+        """JSON mode settings restricting the response to `fields`"""
+        if not self.structured_output:
+            return None
+        return {'response_mime_type': 'application/json', 'response_schema': response_schema(fields, with_ids)}
+
+    def _generate_stream(self, prompt, generation_config=None):
+        """Stream response text chunks; 429/5xx errors are retried until the first chunk arrives"""
+        metrics = self.instrumentation
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(self.prompt_budget.count(prompt))
+            received = False
+            # Only time spent waiting on the API counts, not the consumer's work between chunks
+            waited = 0.0
+            chunk = None
+            try:
+                with self._in_flight:
+                    kwargs = {'stream': True}
+                    if generation_config is not None:
+                        kwargs['generation_config'] = generation_config
+                    start = time.perf_counter()
+                    chunks = iter(self.model.generate_content(prompt, **kwargs))
+                    for chunk in chunks:
+                        waited += time.perf_counter() - start
+                        received = True
+                        yield chunk.text
+                        start = time.perf_counter()
+                    waited += time.perf_counter() - start
+                metrics.record('api_call', waited)
+                # Usage metadata is complete on the last chunk
+                metrics.record_usage(getattr(chunk, 'usage_metadata', None))
+                return
+            except Exception as e:
+                metrics.record('api_call', waited)
+                metrics.count('api_errors')
+                if received or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+            metrics.count('retries')
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def _generate(self, prompt, generation_config=None):
+        """Call the model under the in-flight cap and rate limits, retrying on 429/5xx"""
+        metrics = self.instrumentation
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(self.prompt_budget.count(prompt))
+            try:
+                with self._in_flight, metrics.span('api_call'):
+                    if generation_config is None:
+                        response = self.model.generate_content(prompt)
+                    else:
+                        response = self.model.generate_content(prompt, generation_config=generation_config)
+                metrics.record_usage(getattr(response, 'usage_metadata', None))
+                return response
+            except Exception as e:
+                metrics.count('api_errors')
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+            metrics.count('retries')
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def _cached_json(self, key_parts, compute):
+        """Return (value, cache_hit) for `compute()`, consulting the response cache"""
+        if self.cache is None:
+            value = compute()
+            value.pop('_incomplete', None)
+            return value, False
+        key = self._cache_key(key_parts)
+        value = self.cache.get(key)
+        if value is not None:
+            self.instrumentation.count('cache_hits')
+            return value, True
+        self.instrumentation.count('cache_misses')
+        value = compute()
+        # Results with fields that could not be repaired are not worth keeping
+        if not value.pop('_incomplete', False):
+            self.cache.set(key, value)
+        return value, False
+
+    def _cache_key(self, key_parts):
+        return self.cache.make_key(self.model_name, PROMPT_VERSION, key_parts)
+
+    def _request_fields(self, prompt, fields, with_ids=False):
+        """Call the model and validate the requested fields; returns (valid fields, broken fields)"""
+        response = self._generate(prompt, self._generation_config(fields, with_ids))
+        with self.instrumentation.span('parse'):
+            try:
+                data = extract_json(response.text)
+            except ValueError as e:
+                print(f"Error parsing model response: {e}")
+                return {}, list(fields)
+            return validate_insights(data, fields)
+
+    def _repair_fields(self, lines, fields, with_ids):
+        """Re-request only the broken fields; unrecoverable ones fall back to empty values"""
+        with self.instrumentation.span('prompt_build'):
+            prompt = FIELD_REPAIR_PROMPT.format(
+                fields=', '.join(fields),
+                feedback_text='\n'.join(lines),
+                structure=',\n  '.join(FIELD_EXAMPLES[field] for field in fields)
+            )
+        if with_ids:
+            prompt += CLUSTER_IDS_INSTRUCTIONS
+        repaired, broken = self._request_fields(prompt, fields, with_ids)
+        if len(broken) == len(INSIGHT_FIELDS):
+            raise ValueError("Model returned no usable insights")
+        if broken:
+            print(f"Could not repair fields {broken}; leaving them empty")
+            for field in broken:
+                repaired[field] = json.loads(json.dumps(FIELD_DEFAULTS[field]))
+            repaired['_incomplete'] = True
+        return repaired
+
+    def _batch_lines(self, batch):
+        """Prompt lines for a batch; numbered when counts must be mapped back to cluster sizes"""
+        with self.instrumentation.span('prompt_build'):
+            lines = [_format_comment(comment, weight) for comment, weight in batch]
+            numbered = self.clusterer is not None
+            if numbered:
+                lines = [f"[{i}] {line}" for i, line in enumerate(lines, 1)]
+        return lines, numbered
+
+    def _stream_batch(self, batch, cache_stats, progress=None):
+        """
+        Yield (field, value) pairs for one batch as the streamed response is parsed
+
+        `progress(0, 1)` is called for every received chunk, so a callback
+        that raises (e.g. on cancellation) stops the stream early.
+        """
+        lines, numbered = self._batch_lines(batch)
+        weights = {i: weight for i, (_, weight) in enumerate(batch, 1)}
+        key = self._cache_key(lines) if self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            cache_stats['hits'] += 1
+            self.instrumentation.count('cache_hits')
+            for field in INSIGHT_FIELDS:
+                yield field, cached[field]
+            return
+        cache_stats['misses'] += 1
+        if key:
+            self.instrumentation.count('cache_misses')
+
+        prompt = self._build_prompt(lines)
+        if numbered:
+            prompt += CLUSTER_IDS_INSTRUCTIONS
+        insights = {}
+        parser = StreamingJSONParser()
+        parse_seconds = 0.0
+        for text in self._generate_stream(prompt, self._generation_config(INSIGHT_FIELDS, numbered)):
+            if progress is not None:
+                progress(0, 1)
+            start = time.perf_counter()
+            completed = []
+            for field, raw in parser.feed(text):
+                if field not in INSIGHT_FIELDS or field in insights:
+                    continue
+                valid, broken = validate_insights({field: raw}, [field])
+                if broken:
+                    continue
+                if numbered:
+                    _apply_cluster_weights(valid, weights)
+                insights[field] = valid[field]
+                completed.append(field)
+            parse_seconds += time.perf_counter() - start
+            for field in completed:
+                yield field, insights[field]
+        self.instrumentation.record('parse', parse_seconds)
+
+        broken = [field for field in INSIGHT_FIELDS if field not in insights]
+        incomplete = False
+        if broken:
+            repaired = self._repair_fields(lines, broken, numbered)
+            incomplete = repaired.pop('_incomplete', False)
+            if numbered:
+                _apply_cluster_weights(repaired, weights)
+            for field in broken:
+                insights[field] = repaired[field]
+                yield field, insights[field]
+
+        if key and not incomplete:
+            insights['comment_count'] = sum(weights.values())
+            self.cache.set(key, insights)
+
+    def _analyze_batch(self, batch):
+        """Run a single Gemini call over one batch of (comment, weight) pairs"""
+        lines, numbered = self._batch_lines(batch)
+
+        def compute():
+            prompt = self._build_prompt(lines)
+            if numbered:
+                prompt += CLUSTER_IDS_INSTRUCTIONS
+            insights, broken = self._request_fields(prompt, INSIGHT_FIELDS, numbered)
+            if broken:
+                insights.update(self._repair_fields(lines, broken, numbered))
+            if numbered:
+                _apply_cluster_weights(insights, {i: weight for i, (_, weight) in enumerate(batch, 1)})
+            insights['comment_count'] = sum(weight for _, weight in batch)
+            return insights
+
+        insights, hit = self._cached_json(lines, compute)
+        insights['_cache_hit'] = hit
+        return insights
+
+    def _summarize_merged(self, merged, cache_stats):
+        """Write a single summary and recommendation list for merged batches"""
+        summaries = merged.get('_summaries', [])[:MAX_REDUCE_SUMMARIES]
+        aggregates = {key: merged[key][:10] for key in ('topThemes', 'criticalIssues', 'trendingTopics')}
+        aggregates['sentimentDistribution'] = merged['sentimentDistribution']
+        prompt = SUMMARY_PROMPT.format(
+            aggregates=json.dumps(aggregates),
+            summaries='\n'.join(f"- {s}" for s in summaries)
+        )
+        try:
+            reduced, hit = self._cached_json(['summary', prompt], lambda: self._summarize_request(prompt))
+            cache_stats['hits' if hit else 'misses'] += 1
+            merged['summary'] = reduced['summary']
+            merged['recommendations'] = reduced['recommendations']
+        except Exception as e:
+            # Keep the deterministic merge result if the reduce call fails
+            print(f"Error summarizing merged batches: {e}")
+
+    @staticmethod
+    def load_insights(filename='insights.json'):
+        """Load insights previously written by `save_insights`"""
+        with open(filename) as f:
+            return json.load(f)
+
+    def _summarize_request(self, prompt):
+        """Run the reduce call and validate its summary and recommendations"""
+        fields = ['summary', 'recommendations']
+        reduced, broken = self._request_fields(prompt, fields)
+        if broken:
+            raise ValueError(f"Invalid fields in summary response: {broken}")
+        return reduced
+
     def save_insights(self, insights, filename='insights.json'):
         """Save insights to a JSON file"""
         if 'generated_at' not in insights:
             insights['generated_at'] = datetime.now().isoformat()
-        with open(filename, 'w') as f:
+        # Write to a temporary file first so a crash never leaves a partial file behind
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, 'w') as f:
             json.dump(insights, f, indent=2)
+        os.replace(temp_filename, filename)
         print(f"Insights saved to {filename}")
     
     def print_insights(self, insights):
@@ -162,4 +1262,9 @@ if __name__ == "__main__":
     
     # Example: Loading from CSV
     # df = pd.read_csv('feedback.csv')
-    # insights = analyzer.analyze_feedback(df)
\ No newline at end of file
+    # insights = analyzer.analyze_feedback(df)
+
+    # Example: Daily refresh that only sends new comments
+    # new_comments = ["Dark mode is broken on Android."]
+    # insights = analyzer.analyze_incremental('insights.json', new_comments)
+    # analyzer.save_insights(insights)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import re
+import zlib
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _features(comment, n_features):
+    """Hashed unigram and bigram feature ids for a comment"""
+    words = _WORD.findall(comment.lower())
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    # crc32 is stable across processes, unlike hash()
+    return np.array([zlib.crc32(t.encode('utf-8')) % n_features for t in tokens], dtype=np.int64)
+
+
+class FeedbackClusterer:
+    def __init__(self, n_clusters=200, n_features=2048, batch_size=1024, max_iter=100, seed=0):
+        """
+        Group near-duplicate comments locally so only representatives are prompted
+
+        Comments are turned into TF-IDF hashing vectors with NumPy and grouped
+        with weighted mini-batch k-means (cosine similarity). Vectors are
+        built one mini-batch at a time, so memory stays proportional to
+        `batch_size` rather than the corpus size.
+        """
+        self.n_clusters = n_clusters
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.seed = seed
+
+    def _vectorize(self, feature_ids, rows, idf):
+        # Count features for the whole mini-batch with one bincount over flat indices
+        columns = [feature_ids[row] for row in rows]
+        row_index = np.repeat(np.arange(len(rows)), [len(ids) for ids in columns])
+        flat = row_index * self.n_features + np.concatenate(columns)
+        matrix = np.bincount(flat, minlength=len(rows) * self.n_features).astype(np.float32)
+        matrix = np.log1p(matrix.reshape(len(rows), self.n_features)) * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def representatives(self, comments):
+        """
+        Replace comments by one representative per cluster
+
+        Args:
+            comments: List of (comment, weight) tuples
+
+        Returns:
+            List of (representative comment, total cluster weight) tuples,
+            largest cluster first
+        """
+        n = len(comments)
+        if n <= self.n_clusters:
+            return list(comments)
+
+        k = self.n_clusters
+        rng = np.random.default_rng(self.seed)
+        weights = np.array([weight for _, weight in comments], dtype=np.float64)
+        feature_ids = [_features(comment, self.n_features) for comment, _ in comments]
+
+        document_frequency = np.zeros(self.n_features, dtype=np.float64)
+        for ids in feature_ids:
+            document_frequency[np.unique(ids)] += 1
+        idf = (np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        centers = self._vectorize(feature_ids, rng.choice(n, size=k, replace=False), idf)
+        mass_seen = np.zeros(k, dtype=np.float64)
+        n_iter = min(self.max_iter, max(20, 3 * n // self.batch_size))
+        for _ in range(n_iter):
+            rows = rng.choice(n, size=min(self.batch_size, n), replace=False)
+            batch = self._vectorize(feature_ids, rows, idf)
+            labels = np.argmax(batch @ centers.T, axis=1)
+            batch_weights = weights[rows]
+
+            assignment = np.zeros((k, len(rows)), dtype=np.float32)
+            assignment[labels, np.arange(len(rows))] = batch_weights
+            sums = assignment @ batch
+            mass = np.bincount(labels, weights=batch_weights, minlength=k)
+            mass_seen += mass
+
+            # Per-center learning rate shrinks as a center absorbs more weight
+            hit = mass > 0
+            rate = (mass[hit] / mass_seen[hit]).astype(np.float32)[:, None]
+            means = sums[hit] / mass[hit].astype(np.float32)[:, None]
+            centers[hit] = (1 - rate) * centers[hit] + rate * means
+            norms = np.linalg.norm(centers, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centers /= norms
+
+        sizes = np.zeros(k, dtype=np.float64)
+        best_similarity = np.full(k, -np.inf)
+        best_row = np.zeros(k, dtype=np.int64)
+        for start in range(0, n, self.batch_size):
+            rows = np.arange(start, min(start + self.batch_size, n))
+            similarity = self._vectorize(feature_ids, rows, idf) @ centers.T
+            labels = np.argmax(similarity, axis=1)
+            scores = similarity[np.arange(len(rows)), labels]
+            sizes += np.bincount(labels, weights=weights[rows], minlength=k)
+            for row, label, score in zip(rows, labels, scores):
+                if score > best_similarity[label]:
+                    best_similarity[label] = score
+                    best_row[label] = row
+
+        clusters = [(comments[best_row[j]][0], int(sizes[j])) for j in np.argsort(-sizes, kind='stable') if sizes[j] > 0]
+        return clusters
@@ -0,0 +1,163 @@
+import codecs
+import io
+
+FILE_STRUCTURES = ["Standard CSV", "Comma Separated", "One Comment Per Line"]
+
+# Bytes inspected to pick an encoding
+ENCODING_PREFIX_BYTES = 64 * 1024
+
+# Rows per pandas chunk / bytes per text read
+DEFAULT_CHUNKSIZE = 10000
+TEXT_READ_BYTES = 1024 * 1024
+
+
+def detect_encoding(file, prefix_bytes=ENCODING_PREFIX_BYTES):
+    """Guess the encoding of a binary file from its first bytes (utf-8, else cp1252)"""
+    file.seek(0)
+    prefix = file.read(prefix_bytes)
+    file.seek(0)
+    if prefix.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Incremental decoding tolerates a multi-byte character cut off by the prefix
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def _clean(comment):
+    return comment.strip().strip('"').strip()
+
+
+def _iter_text(file, encoding):
+    """Decode a binary file lazily without closing it afterwards"""
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding=encoding, errors='replace')
+    try:
+        yield text
+    finally:
+        # Detach so the caller's file object stays open
+        text.detach()
+
+
+def _iter_lines(file, encoding, start_line=1, strip_quotes=False):
+    for text in _iter_text(file, encoding):
+        for line_number, line in enumerate(text, 1):
+            if line_number < start_line:
+                continue
+            comment = _clean(line) if strip_quotes else line.strip()
+            if comment:
+                yield comment
+
+
+def _iter_comma_separated(file, encoding):
+    for text in _iter_text(file, encoding):
+        remainder = ''
+        while True:
+            chunk = text.read(TEXT_READ_BYTES)
+            if not chunk:
+                break
+            pieces = (remainder + chunk).split(',')
+            # The last piece may continue in the next chunk
+            remainder = pieces.pop()
+            for piece in pieces:
+                comment = _clean(piece)
+                if comment:
+                    yield comment
+        comment = _clean(remainder)
+        if comment:
+            yield comment
+
+
+def _iter_csv(file, encoding, column, chunksize):
+    # pandas is imported by the CSV readers only, so text uploads never load it
+    import pandas as pd
+    file.seek(0)
+    header = pd.read_csv(file, nrows=0, encoding=encoding, encoding_errors='replace').columns
+    if column is None:
+        # Same default as `FeedbackAnalyzer` uses for DataFrames
+        column = 'feedback' if 'feedback' in header else header[0]
+    elif column not in header:
+        raise ValueError(f"Column '{column}' not found in CSV (columns: {', '.join(map(str, header))})")
+    file.seek(0)
+    reader = pd.read_csv(file, chunksize=chunksize, encoding=encoding, encoding_errors='replace', usecols=[column])
+    for chunk in reader:
+        for value in chunk.iloc[:, 0].dropna():
+            comment = str(value).strip()
+            if comment:
+                yield comment
+
+
+def read_csv_preview(file, rows=5, encoding=None):
+    """Read the first rows of a CSV for previews and column selection"""
+    import pandas as pd
+    encoding = encoding or detect_encoding(file)
+    try:
+        return pd.read_csv(file, nrows=rows, encoding=encoding, encoding_errors='replace')
+    finally:
+        file.seek(0)
+
+
+def read_csv_columns(file, columns, encoding=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Read only `columns` of a CSV into a DataFrame
+
+    The file is parsed in chunks and every column except the first is
+    stored as a category, so grouping columns (version, region, ...) stay
+    small even for large files.
+    """
+    import pandas as pd
+    encoding = encoding or detect_encoding(file)
+    file.seek(0)
+    reader = pd.read_csv(file, chunksize=chunksize, encoding=encoding, encoding_errors='replace', usecols=columns)
+    chunks = [chunk.astype({column: 'category' for column in columns[1:]}) for chunk in reader]
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    frame = pd.concat(chunks, ignore_index=True)
+    # Chunks can have different categories; concat falls back to object columns then
+    return frame.astype({column: 'category' for column in columns[1:]})[columns]
+
+
+def iter_comments(file, file_structure="Standard CSV", start_line=1, column=None,
+                  chunksize=DEFAULT_CHUNKSIZE, encoding=None):
+    """
+    Lazily yield feedback comments from an uploaded CSV/TXT file
+
+    The file is decoded in chunks so memory use stays flat regardless of
+    its size. If a "Standard CSV" file cannot be parsed, it is read as one
+    comment per line instead (matching the dashboard's fallback); an unknown
+    `column` raises `ValueError` instead.
+
+    Args:
+        file: Binary file-like object (e.g. a Streamlit UploadedFile)
+        file_structure: One of FILE_STRUCTURES
+        start_line: First line to read for "One Comment Per Line" (1-based)
+        column: Column to read for "Standard CSV" (defaults to 'feedback' if
+            present, else the first column)
+        chunksize: Rows per chunk when parsing CSV
+        encoding: Text encoding (detected from a prefix when omitted)
+
+    Yields:
+        Cleaned, non-empty comment strings
+    """
+    encoding = encoding or detect_encoding(file)
+
+    if file_structure == "Standard CSV":
+        import pandas as pd
+        comments = _iter_csv(file, encoding, column, chunksize)
+        try:
+            first = next(comments, None)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError):
+            # Unparseable CSV: fall back to a plain text list
+            yield from _iter_lines(file, encoding, strip_quotes=True)
+            return
+        if first is not None:
+            yield first
+            yield from comments
+    elif file_structure == "Comma Separated":
+        yield from _iter_comma_separated(file, encoding)
+    elif file_structure == "One Comment Per Line":
+        yield from _iter_lines(file, encoding, start_line=start_line)
+    else:
+        raise ValueError(f"Unknown file structure: {file_structure}")
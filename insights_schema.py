@@ -0,0 +1,351 @@
+import json
+
+INSIGHT_FIELDS = [
+    'sentimentDistribution', 'topThemes', 'criticalIssues', 'trendingTopics', 'summary', 'recommendations'
+]
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+PRIORITIES = ('high', 'medium', 'low')
+
+# JSON snippets shown to the model when only some fields are re-requested
+FIELD_EXAMPLES = {
+    'sentimentDistribution': '"sentimentDistribution": [{"name": "Positive|Negative|Neutral", "value": <number>}]',
+    'topThemes': '"topThemes": [{"theme": "<theme name>", "count": <number>, "sentiment": "positive|negative|neutral"}]',
+    'criticalIssues': '"criticalIssues": [{"issue": "<brief issue>", "priority": "high|medium|low", "mentions": <number>}]',
+    'trendingTopics': '"trendingTopics": [{"topic": "<topic>", "mentions": <number>}]',
+    'summary': '"summary": "<brief 2-3 sentence summary>"',
+    'recommendations': '"recommendations": ["<action 1>", "<action 2>", "<action 3>"]',
+}
+
+# Responses are small, so trying this many cut points is cheap
+MAX_REPAIR_ATTEMPTS = 200
+
+
+def _object(properties, required=None):
+    return {'type': 'object', 'properties': properties, 'required': required or list(properties)}
+
+
+def _array(items):
+    return {'type': 'array', 'items': items}
+
+
+FIELD_SCHEMAS = {
+    'sentimentDistribution': _array(_object({'name': {'type': 'string'}, 'value': {'type': 'integer'}})),
+    'topThemes': _array(_object({
+        'theme': {'type': 'string'},
+        'count': {'type': 'integer'},
+        'sentiment': {'type': 'string', 'enum': list(SENTIMENTS)},
+    })),
+    'criticalIssues': _array(_object({
+        'issue': {'type': 'string'},
+        'priority': {'type': 'string', 'enum': list(PRIORITIES)},
+        'mentions': {'type': 'integer'},
+    })),
+    'trendingTopics': _array(_object({'topic': {'type': 'string'}, 'mentions': {'type': 'integer'}})),
+    'summary': {'type': 'string'},
+    'recommendations': _array({'type': 'string'}),
+}
+
+
+def response_schema(fields=INSIGHT_FIELDS, with_ids=False):
+    """
+    Build a Gemini `response_schema` for the given insight fields
+
+    With `with_ids`, theme and issue entries also carry the `ids` of the
+    (numbered) comments they cover.
+    """
+    properties = {}
+    for field in fields:
+        schema = json.loads(json.dumps(FIELD_SCHEMAS[field]))
+        if with_ids and field in ('topThemes', 'criticalIssues'):
+            schema['items']['properties']['ids'] = _array({'type': 'integer'})
+        properties[field] = schema
+    return _object(properties)
+
+
+# Per-comment labeling: each batch defines its own theme/issue lists and labels refer to them by index
+LABEL_SCHEMA = _object({
+    'themes': _array({'type': 'string'}),
+    'issues': _array(_object({'issue': {'type': 'string'}, 'priority': {'type': 'string', 'enum': list(PRIORITIES)}})),
+    'labels': _array(_object({
+        'id': {'type': 'integer'},
+        'sentiment': {'type': 'string', 'enum': list(SENTIMENTS)},
+        'themes': _array({'type': 'integer'}),
+        'issues': _array({'type': 'integer'}),
+    })),
+})
+
+
+def repair_truncated_json(text):
+    """Cut a truncated JSON object back to its last complete element and close it"""
+    stack = []
+    in_string = False
+    escape = False
+    cuts = []
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[:i + 1]
+            cuts.append((i + 1, ''.join(reversed(stack))))
+        elif ch == ',':
+            cuts.append((i, ''.join(reversed(stack))))
+
+    for end, closers in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        candidate = text[:end] + closers
+        try:
+            json.loads(candidate)
+            return candidate
+        except ValueError:
+            continue
+    raise ValueError("Could not repair JSON response")
+
+
+def extract_json(text):
+    """
+    Parse the JSON object out of a model response
+
+    Markdown fences and any preamble or trailing text are ignored, and a
+    truncated object is cut back to its last complete element.
+    """
+    text = text.replace('```json', '').replace('```', '')
+    start = text.find('{')
+    if start < 0:
+        raise ValueError("No JSON object in model response")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+        return value
+    except ValueError:
+        return json.loads(repair_truncated_json(text[start:]))
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return int(float(value))
+
+
+def _validate_items(value, required, coerce):
+    if not isinstance(value, list):
+        raise ValueError("expected a list")
+    items = []
+    for item in value:
+        if not isinstance(item, dict) or any(key not in item for key in required):
+            raise ValueError("malformed entry")
+        items.append(coerce(dict(item)))
+    return items
+
+
+def _coerce_sentiment(item):
+    item['name'] = str(item['name']).strip().capitalize()
+    item['value'] = _as_int(item['value'])
+    return item
+
+
+def _coerce_theme(item):
+    item['theme'] = str(item['theme'])
+    item['count'] = _as_int(item['count'])
+    sentiment = str(item.get('sentiment', '')).lower()
+    item['sentiment'] = sentiment if sentiment in SENTIMENTS else 'neutral'
+    return item
+
+
+def _coerce_issue(item):
+    item['issue'] = str(item['issue'])
+    item['mentions'] = _as_int(item['mentions'])
+    priority = str(item.get('priority', '')).lower()
+    item['priority'] = priority if priority in PRIORITIES else 'medium'
+    return item
+
+
+def _coerce_topic(item):
+    item['topic'] = str(item['topic'])
+    item['mentions'] = _as_int(item['mentions'])
+    return item
+
+
+def _validate_summary(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected a non-empty string")
+    return value.strip()
+
+
+def _validate_recommendations(value):
+    if not isinstance(value, list):
+        raise ValueError("expected a list")
+    return [str(rec) for rec in value if str(rec).strip()]
+
+
+FIELD_VALIDATORS = {
+    'sentimentDistribution': lambda v: _validate_items(v, ('name', 'value'), _coerce_sentiment),
+    'topThemes': lambda v: _validate_items(v, ('theme', 'count'), _coerce_theme),
+    'criticalIssues': lambda v: _validate_items(v, ('issue', 'mentions'), _coerce_issue),
+    'trendingTopics': lambda v: _validate_items(v, ('topic', 'mentions'), _coerce_topic),
+    'summary': _validate_summary,
+    'recommendations': _validate_recommendations,
+}
+
+FIELD_DEFAULTS = {
+    'sentimentDistribution': [], 'topThemes': [], 'criticalIssues': [],
+    'trendingTopics': [], 'summary': '', 'recommendations': [],
+}
+
+
+def validate_insights(data, fields=INSIGHT_FIELDS):
+    """
+    Validate and coerce insight fields against the schema
+
+    Numbers sent as strings, unknown sentiment/priority labels and similar
+    small problems are fixed in place; fields that cannot be fixed are
+    reported so only they need to be requested again.
+
+    Returns:
+        (dict of valid fields, list of broken field names)
+    """
+    valid = {}
+    broken = []
+    if not isinstance(data, dict):
+        return valid, list(fields)
+    for field in fields:
+        try:
+            valid[field] = FIELD_VALIDATORS[field](data[field])
+        except (KeyError, TypeError, ValueError):
+            broken.append(field)
+    # Extra keys (e.g. metadata) pass through untouched
+    for key, value in data.items():
+        if key not in FIELD_VALIDATORS:
+            valid[key] = value
+    return valid, broken
+
+
+def _index_list(value, size):
+    """Valid, distinct 0-based indexes from a label's theme/issue list"""
+    if not isinstance(value, list):
+        return []
+    indexes = []
+    for item in value:
+        try:
+            index = _as_int(item)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < size and index not in indexes:
+            indexes.append(index)
+    return indexes
+
+
+def validate_labels(data, count):
+    """
+    Validate a per-comment labeling response for a batch of `count` comments
+
+    Out-of-range ids and theme/issue indexes are dropped and unknown
+    sentiment/priority labels are coerced, so one bad entry never discards
+    the rest of the batch.
+
+    Returns:
+        (dict of comment id -> {'sentiment', 'themes', 'issues'} with theme
+        and issue names, dict of issue name -> priority)
+    """
+    if not isinstance(data, dict):
+        return {}, {}
+    themes = [str(theme) for theme in data.get('themes') or [] if str(theme).strip()]
+    issues = []
+    for issue in data.get('issues') or []:
+        if isinstance(issue, dict) and str(issue.get('issue', '')).strip():
+            priority = str(issue.get('priority', '')).lower()
+            issues.append({'issue': str(issue['issue']), 'priority': priority if priority in PRIORITIES else 'medium'})
+    labels = {}
+    for label in data.get('labels') or []:
+        if not isinstance(label, dict):
+            continue
+        try:
+            comment_id = _as_int(label.get('id'))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= comment_id <= count or comment_id in labels:
+            continue
+        sentiment = str(label.get('sentiment', '')).lower()
+        labels[comment_id] = {
+            'sentiment': sentiment if sentiment in SENTIMENTS else 'neutral',
+            'themes': [themes[i] for i in _index_list(label.get('themes'), len(themes))],
+            'issues': [issues[i]['issue'] for i in _index_list(label.get('issues'), len(issues))],
+        }
+    return labels, {issue['issue']: issue['priority'] for issue in issues}
+
+
+class StreamingJSONParser:
+    def __init__(self):
+        """
+        Incremental parser that emits top-level fields of a streamed JSON object
+
+        Feed response chunks as they arrive; each call returns the (key, value)
+        pairs whose values were completed by that chunk. Text before the
+        opening brace (fences, preamble) is ignored.
+        """
+        self.buffer = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.segment_start = None
+        self.key = None
+        self.value_start = None
+
+    def _emit(self, end, fields):
+        if self.key is not None:
+            try:
+                fields.append((self.key, json.loads(self.buffer[self.value_start:end])))
+            except ValueError:
+                pass
+        self.key = None
+
+    def feed(self, chunk):
+        """Consume a chunk of response text and return newly completed fields"""
+        fields = []
+        self.buffer += chunk
+        for i in range(self.position, len(self.buffer)):
+            ch = self.buffer[i]
+            if self.depth == 0:
+                if ch == '{' and self.segment_start is None:
+                    self.depth = 1
+                    self.segment_start = i + 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._emit(i, fields)
+            elif self.depth == 1 and ch == ':':
+                try:
+                    self.key = json.loads(self.buffer[self.segment_start:i])
+                except ValueError:
+                    self.key = None
+                self.value_start = i + 1
+            elif self.depth == 1 and ch == ',':
+                self._emit(i, fields)
+                self.segment_start = i + 1
+        self.position = len(self.buffer)
+        return fields
@@ -0,0 +1,219 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stages timed by the analyzer and dashboard, in pipeline order
+STAGES = (
+    'ingest', 'normalize', 'compact', 'local_classify', 'cluster', 'prompt_build', 'api_call', 'parse', 'merge', 'render'
+)
+
+# Token counts read from Gemini's usage_metadata
+USAGE_FIELDS = {
+    'prompt_tokens': 'prompt_token_count',
+    'output_tokens': 'candidates_token_count',
+    'total_tokens': 'total_token_count',
+}
+
+METRIC_PREFIX = 'feedback_analyzer'
+
+
+class Instrumentation:
+    def __init__(self, exporters=(), parent=None):
+        """
+        Thread-safe stage timings, token usage and counters
+
+        Totals accumulate across runs; take a `snapshot()` before and after a
+        run and use `snapshot_delta` to see a single run. Every recorded event
+        is also passed to each exporter (e.g. `json_lines_exporter`), so a
+        slow exporter slows the hot path; keep them cheap. With `parent`,
+        everything is recorded there too, so a per-run instance can measure
+        one run while still feeding shared totals.
+        """
+        self.exporters = list(exporters)
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.tokens = dict.fromkeys(USAGE_FIELDS, 0)
+            self.counters = {}
+
+    def _export(self, event):
+        event['time'] = time.time()
+        for exporter in self.exporters:
+            exporter(event)
+
+    def record(self, stage, seconds):
+        """Add one timing for `stage`"""
+        with self._lock:
+            stats = self.stages.setdefault(stage, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if self.parent is not None:
+            self.parent.record(stage, seconds)
+        if self.exporters:
+            self._export({'type': 'span', 'stage': stage, 'seconds': round(seconds, 6)})
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one `stage` span"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        """Yield from `iterable`, recording the time spent producing items as one span"""
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    return
+                elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.record(stage, elapsed)
+
+    def count(self, name, amount=1):
+        """Increment a counter (retries, errors, cache hits, ...)"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        if self.parent is not None:
+            self.parent.count(name, amount)
+        if self.exporters:
+            self._export({'type': 'count', 'name': name, 'amount': amount})
+
+    def record_usage(self, usage_metadata):
+        """Add token counts from a response's `usage_metadata` (ignored if missing)"""
+        if usage_metadata is None:
+            return
+        if self.parent is not None:
+            self.parent.record_usage(usage_metadata)
+        usage = {key: getattr(usage_metadata, field, 0) or 0 for key, field in USAGE_FIELDS.items()}
+        with self._lock:
+            for key, value in usage.items():
+                self.tokens[key] += value
+        if self.exporters:
+            self._export({'type': 'usage', **usage})
+
+    def snapshot(self):
+        """Copy of the current totals"""
+        with self._lock:
+            return {
+                'stages': {stage: dict(stats) for stage, stats in self.stages.items()},
+                'tokens': dict(self.tokens),
+                'counters': dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """Totals in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, stats in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_seconds"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for stage, stats in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{stage}"}} {stats["max_seconds"]:.6f}')
+        lines.append(f"# TYPE {prefix}_tokens_total counter")
+        for key, value in snapshot['tokens'].items():
+            lines.append(f'{prefix}_tokens_total{{kind="{key[:-len("_tokens")]}"}} {value}')
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class NullInstrumentation:
+    """Drop-in replacement for `Instrumentation` that records nothing"""
+
+    def span(self, stage):
+        return nullcontext()
+
+    def timed_iter(self, stage, iterable):
+        return iterable
+
+    def record(self, stage, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def record_usage(self, usage_metadata):
+        pass
+
+
+def snapshot_delta(before, after):
+    """Difference between two snapshots (e.g. the cost of a single run)"""
+    stages = {}
+    for stage, stats in after['stages'].items():
+        previous = before['stages'].get(stage, {'count': 0, 'total_seconds': 0.0})
+        count = stats['count'] - previous['count']
+        if count:
+            stages[stage] = {'count': count, 'total_seconds': stats['total_seconds'] - previous['total_seconds']}
+    return {
+        'stages': stages,
+        'tokens': {key: value - before['tokens'].get(key, 0) for key, value in after['tokens'].items()},
+        'counters': {name: value - before['counters'].get(name, 0) for name, value in after['counters'].items()
+                     if value != before['counters'].get(name, 0)},
+    }
+
+
+def json_lines_exporter(path):
+    """Exporter appending each event as one JSON line to `path`"""
+    lock = threading.Lock()
+    log_file = open(path, 'a', buffering=1)
+
+    def export(event):
+        with lock:
+            log_file.write(json.dumps(event) + '\n')
+    return export
+
+
+def logging_exporter(logger_name='feedback_analyzer.metrics', level=logging.DEBUG):
+    """Exporter sending each event as JSON through the `logging` module"""
+    logger = logging.getLogger(logger_name)
+
+    def export(event):
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(event))
+    return export
+
+
+def serve_prometheus(instrumentation, port=9464, host='127.0.0.1'):
+    """
+    Serve `instrumentation.to_prometheus()` over HTTP from a daemon thread
+
+    Returns:
+        The running `ThreadingHTTPServer` (call `shutdown()` to stop it)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = instrumentation.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
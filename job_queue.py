@@ -0,0 +1,230 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY, owner TEXT, description TEXT, status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0, total INTEGER, message TEXT, error TEXT, result TEXT,
+    created_at REAL NOT NULL, started_at REAL, finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at);
+"""
+
+# Job lifecycle: queued -> running -> done | failed | cancelled
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+# Analyses run concurrently across all sessions
+DEFAULT_JOB_WORKERS = 4
+
+# Finished jobs (and their results) are deleted after this many seconds
+DEFAULT_JOB_RETENTION_SECONDS = 3600
+
+# How often expired jobs are deleted in the background
+DEFAULT_PRUNE_INTERVAL_SECONDS = 60
+
+STATUS_COLUMNS = ('job_id', 'owner', 'description', 'status', 'done', 'total', 'message', 'error',
+                  'created_at', 'started_at', 'finished_at')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job (from `JobContext.progress`) once it has been cancelled"""
+
+
+class JobContext:
+    def __init__(self, queue, job_id):
+        """Handle passed to a running job for progress reports and cancellation checks"""
+        self.queue = queue
+        self.job_id = job_id
+
+    @property
+    def cancelled(self):
+        return self.job_id in self.queue._cancelled
+
+    def progress(self, done, total=None, message=None):
+        """
+        Record progress, raising `JobCancelled` if the job was cancelled
+
+        Has the signature of the analyzer's `progress` callback, so it can be
+        passed straight to `analyze_feedback`.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+        self.queue._update(self.job_id, done=done, total=total, message=message)
+
+    def publish(self, key, value):
+        """Expose an intermediate result (e.g. a streamed insights section) to pollers"""
+        with self.queue._lock:
+            self.queue._partial.setdefault(self.job_id, {})[key] = value
+
+
+class JobQueue:
+    def __init__(self, path='feedback_jobs.sqlite', max_workers=DEFAULT_JOB_WORKERS,
+                 retention_seconds=DEFAULT_JOB_RETENTION_SECONDS, prune_interval=DEFAULT_PRUNE_INTERVAL_SECONDS):
+        """
+        Background worker pool with a SQLite job table
+
+        Jobs are plain functions run on a thread pool, so they keep running
+        when the Streamlit script that submitted them reruns or its session
+        times out. Status and progress live in the job table, where any
+        session (or a reloaded page) can poll them by job id. Results are
+        kept in memory and also stored as JSON; values that are not JSON
+        (e.g. `CommentLabels`) are stored as null and only survive in memory.
+        Jobs still queued or running when the process stopped are marked
+        failed on startup. Finished jobs are deleted, from the table and from
+        memory, once they are `retention_seconds` old: a background thread
+        checks every `prune_interval` seconds, and expired jobs are never
+        returned by `status` or `result` in between.
+        """
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        with self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', finished_at = ? "
+                "WHERE status IN ('queued', 'running')", (time.time(),)
+            )
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='feedback-job')
+        self._futures = {}
+        self._results = {}
+        self._partial = {}
+        self._cancelled = set()
+        self.prune()
+        self._stopped = threading.Event()
+        if prune_interval:
+            threading.Thread(target=self._prune_periodically, args=(prune_interval,), daemon=True,
+                             name='feedback-job-pruner').start()
+
+    def _prune_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.prune()
+            except Exception as e:
+                print(f"Error pruning jobs: {e}")
+
+    def submit(self, fn, *args, owner=None, description='', **kwargs):
+        """
+        Queue `fn(context, *args, **kwargs)` and return its job id
+
+        `context` is a `JobContext`; pass `context.progress` as the analyzer's
+        `progress` callback to report progress and stop on cancellation.
+        `owner` (e.g. an API key fingerprint) lets callers list and check
+        their own jobs.
+        """
+        self.prune()
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, owner, description, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, owner, description, time.time())
+            )
+            self._futures[job_id] = self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        if job_id in self._cancelled:
+            self._finish(job_id, 'cancelled')
+            return
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = fn(JobContext(self, job_id), *args, **kwargs)
+        except JobCancelled:
+            self._finish(job_id, 'cancelled')
+        except Exception as e:
+            print(f"Error in job {job_id}: {e}")
+            self._finish(job_id, 'failed', error=str(e))
+        else:
+            with self._lock:
+                self._results[job_id] = result
+            self._finish(job_id, 'done', result=json.dumps(result, default=lambda value: None))
+
+    def _finish(self, job_id, status, **fields):
+        self._update(job_id, status=status, finished_at=time.time(), **fields)
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._partial.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def status(self, job_id):
+        """
+        Current state of a job
+
+        Returns:
+            Dict with the job table's columns ('status', 'done', 'total',
+            'message', 'error', timestamps, ...) plus 'partial' results
+            published so far, or None for an unknown (or pruned) job
+        """
+        self.prune()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(STATUS_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            partial = dict(self._partial.get(job_id, {}))
+        if row is None:
+            return None
+        return {**dict(zip(STATUS_COLUMNS, row)), 'partial': partial}
+
+    def result(self, job_id):
+        """Return value of a finished job (None while it is queued or running, if it failed, or once expired)"""
+        self.prune()
+        with self._lock:
+            if job_id in self._results:
+                return self._results[job_id]
+            row = self._db.execute(
+                "SELECT result FROM jobs WHERE job_id = ? AND status = 'done'", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop
+
+        A queued job never starts; a running job stops at its next
+        `progress` call. Returns False if the job is unknown or finished.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None:
+                return False
+            self._cancelled.add(job_id)
+        if future.cancel():
+            self._finish(job_id, 'cancelled')
+        return True
+
+    def jobs(self, owner=None, limit=20):
+        """Newest jobs first, optionally only those of `owner`"""
+        self.prune()
+        query = f"SELECT {', '.join(STATUS_COLUMNS)} FROM jobs"
+        params = ()
+        if owner is not None:
+            query += " WHERE owner = ?"
+            params = (owner,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [dict(zip(STATUS_COLUMNS, row)) for row in rows]
+
+    def prune(self):
+        """Delete finished jobs older than `retention_seconds`"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock, self._db:
+            expired = [row[0] for row in self._db.execute(
+                f"SELECT job_id FROM jobs WHERE status IN {FINISHED_STATUSES} AND finished_at < ?", (cutoff,)
+            )]
+            self._db.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+            for job_id in expired:
+                self._results.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        """Cancel queued jobs and stop the worker pool and the pruning thread"""
+        self._stopped.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,108 @@
+import re
+
+# Only words that are positive on their own; 'like', 'fast', 'thanks' or 'clean' also appear in complaints
+# ("Feels like forever to load", "Battery drains fast", "Thanks for nothing")
+POSITIVE_WORDS = {
+    'love', 'loved', 'loving', 'great', 'amazing', 'awesome', 'excellent', 'fantastic', 'perfect',
+    'perfectly', 'best', 'good', 'nice', 'helpful', 'easy', 'intuitive', 'cleaner', 'smooth',
+    'responsive', 'impressed', 'recommend', 'flawless', 'flawlessly', 'seamless', 'useful',
+    'wonderful', 'brilliant', 'happy',
+}
+
+NEGATIVE_WORDS = {
+    'hate', 'bad', 'terrible', 'awful', 'horrible', 'worst', 'broken', 'crash', 'crashes', 'crashed',
+    'crashing', 'bug', 'bugs', 'buggy', 'slow', 'lag', 'laggy', 'freeze', 'freezes', 'frozen', 'error',
+    'errors', 'fail', 'fails', 'failed', 'confusing', 'frustrating', 'annoying', 'useless', 'expensive',
+    'unacceptable', 'unusable', 'disappointed', 'disappointing', 'poor', 'timeout', 'glitch', 'glitchy',
+}
+
+# Words that flip or hedge sentiment; comments containing them go to the model
+AMBIGUOUS_WORDS = {
+    'not', 'no', 'never', 'dont', 'doesnt', 'didnt', 'isnt', 'wasnt', 'cant', 'cannot', 'wont',
+    'but', 'however', 'although', 'though', 'except', 'unless', 'if', 'should', 'would', 'could',
+}
+
+THEME_KEYWORDS = {
+    'Stability': {'crash', 'crashes', 'crashed', 'crashing', 'bug', 'bugs', 'buggy', 'broken', 'freeze',
+                  'freezes', 'frozen', 'error', 'errors', 'glitch', 'glitchy'},
+    'Performance': {'slow', 'fast', 'lag', 'laggy', 'loading', 'speed', 'timeout', 'performance'},
+    'Pricing': {'price', 'pricing', 'expensive', 'cheap', 'cost', 'subscription'},
+    'Usability': {'ui', 'interface', 'intuitive', 'confusing', 'easy', 'navigation', 'design', 'layout'},
+    'Customer Support': {'support', 'helpful', 'service', 'responsive'},
+    'Mobile App': {'mobile', 'ios', 'android', 'phone'},
+}
+
+_WORD = re.compile(r"[a-z]+")
+
+
+class LocalClassifier:
+    def __init__(self, max_words=12, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS,
+                 theme_keywords=THEME_KEYWORDS):
+        """
+        Lexicon-based fast path for short, unambiguous comments
+
+        A comment is classified locally only if it has at most `max_words`
+        words, hits only positive words in the lexicon, and contains no
+        negation/hedging words or question marks. Negative comments always go
+        to the model, which names the issue behind them ("App crashes" is a
+        critical issue, not just a negative count); negative words only keep
+        mixed comments off the fast path. Everything else is left for the
+        model.
+        """
+        self.max_words = max_words
+        self.positive_words = positive_words
+        self.negative_words = negative_words
+        self.theme_keywords = theme_keywords
+
+    def classify(self, comment):
+        """Return (sentiment, themes) for an easy positive comment, or None if the model should see it"""
+        if '?' in comment:
+            return None
+        words = _WORD.findall(comment.lower().replace("'", ''))
+        if not words or len(words) > self.max_words:
+            return None
+        vocabulary = set(words)
+        if vocabulary & AMBIGUOUS_WORDS:
+            return None
+        if not vocabulary & self.positive_words or vocabulary & self.negative_words:
+            return None
+        themes = [theme for theme, keywords in self.theme_keywords.items() if vocabulary & keywords]
+        return 'positive', themes
+
+    def split(self, comments):
+        """
+        Separate easy comments from those that need the model
+
+        Args:
+            comments: List of (comment, weight) tuples
+
+        Returns:
+            (remaining (comment, weight) tuples, partial insights for the
+            locally classified comments or None if there were none)
+        """
+        remaining = []
+        themes = {}
+        local_count = 0
+        for comment, weight in comments:
+            result = self.classify(comment)
+            if result is None:
+                remaining.append((comment, weight))
+                continue
+            local_count += weight
+            for theme in result[1]:
+                themes[theme] = themes.get(theme, 0) + weight
+
+        if not local_count:
+            return remaining, None
+
+        return remaining, {
+            'sentimentDistribution': [{'name': 'Positive', 'value': local_count}, {'name': 'Negative', 'value': 0},
+                                      {'name': 'Neutral', 'value': 0}],
+            'topThemes': [{'theme': theme, 'count': count, 'sentiment': 'positive'} for theme, count in themes.items()],
+            # Negative comments (and so every issue) are left for the model
+            'criticalIssues': [],
+            'trendingTopics': [],
+            'summary': f"{local_count} short positive comments were classified locally.",
+            'recommendations': [],
+            'comment_count': local_count,
+        }
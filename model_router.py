@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from insights_schema import extract_json
+from instrumentation import NullInstrumentation
+from local_classifier import AMBIGUOUS_WORDS
+from prompt_budget import CHARS_PER_TOKEN, context_window
+
+# Prompts above this many (estimated) tokens go to the strong model
+DEFAULT_LARGE_PROMPT_TOKENS = 8000
+
+# Share of comments with negations/hedges above which a batch counts as ambiguous
+DEFAULT_AMBIGUITY_THRESHOLD = 0.4
+
+# Threads for primary and hedged requests (hedged losers keep running until they return)
+DEFAULT_HEDGE_WORKERS = 16
+
+
+def _feedback_lines(prompt):
+    """Comment lines of an analysis/labeling prompt (empty for other prompts)"""
+    if "Feedback:\n" not in prompt:
+        return []
+    section = prompt.split("Feedback:\n", 1)[1].split("\n\nReturn", 1)[0]
+    return [line for line in section.splitlines() if line.strip()]
+
+
+def ambiguity(prompt):
+    """Share of a prompt's comments containing negation or hedging words"""
+    lines = _feedback_lines(prompt)
+    if not lines:
+        return 0.0
+    ambiguous = sum(1 for line in lines if AMBIGUOUS_WORDS.intersection(line.lower().replace("'", '').split()))
+    return ambiguous / len(lines)
+
+
+def _valid_json(response):
+    """A response counts as valid once its JSON can be parsed"""
+    try:
+        extract_json(response.text)
+        return True
+    except (ValueError, AttributeError):
+        return False
+
+
+class ModelRouter:
+    def __init__(self, fast, strong=None, fallback=None, large_prompt_tokens=DEFAULT_LARGE_PROMPT_TOKENS,
+                 ambiguity_threshold=DEFAULT_AMBIGUITY_THRESHOLD, hedge_after=None, validate=_valid_json,
+                 instrumentation=None, max_workers=DEFAULT_HEDGE_WORKERS):
+        """
+        Route each request to a fast or strong model, optionally hedging slow calls
+
+        Small, clear-cut prompts go to `fast`; prompts over
+        `large_prompt_tokens` or whose comments are mostly ambiguous go to
+        `strong` (if given). With `hedge_after` (seconds), a request still
+        running after that deadline is duplicated to `fallback` (default: the
+        fast model) and the first response that passes `validate` wins.
+        Streaming requests are routed but not hedged.
+
+        The router has a `generate_content` method, so it can be passed as
+        `model` to `FeedbackAnalyzer`. Hedged requests are not counted by the
+        analyzer's rate limiter, so leave quota headroom when enabling them.
+        """
+        self.fast = fast
+        self.strong = strong
+        self.fallback = fallback or fast
+        self.large_prompt_tokens = large_prompt_tokens
+        self.ambiguity_threshold = ambiguity_threshold
+        self.hedge_after = hedge_after
+        self.validate = validate
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers) if hedge_after is not None else None
+        self._lock = threading.Lock()
+        self.counts = {'fast': 0, 'strong': 0, 'hedged': 0, 'hedge_wins': 0}
+        # Token counting (prompt budget calibration) uses the fast model's tokenizer
+        self.count_tokens = getattr(fast, 'count_tokens', None)
+
+        names = [self._name(fast)] + ([self._name(strong)] if strong is not None else [])
+        self.model_name = ' → '.join(names)
+        # Every routed prompt must fit whichever model it is sent to
+        models = [m for m in (fast, strong, fallback) if m is not None]
+        self.context_window = min(context_window(self._name(m)) for m in models)
+
+    @classmethod
+    def from_names(cls, fast_name, strong_name=None, fallback_name=None, api_key=None, **options):
+        """Router over Gemini models given by name, each bound to a client for `api_key`"""
+        from feedback_analyzer import gemini_model
+        return cls(
+            gemini_model(fast_name, api_key),
+            gemini_model(strong_name, api_key) if strong_name else None,
+            gemini_model(fallback_name, api_key) if fallback_name else None,
+            **options
+        )
+
+    @staticmethod
+    def _name(model):
+        return str(getattr(model, 'model_name', model)).replace('models/', '')
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+        self.instrumentation.count(f"routed_{key}" if key in ('fast', 'strong') else key)
+
+    def route(self, prompt):
+        """The model a prompt should go to"""
+        if self.strong is None:
+            return self.fast
+        if len(prompt) // CHARS_PER_TOKEN + 1 > self.large_prompt_tokens:
+            return self.strong
+        if ambiguity(prompt) > self.ambiguity_threshold:
+            return self.strong
+        return self.fast
+
+    def generate_content(self, prompt, **kwargs):
+        model = self.route(prompt)
+        self._count('strong' if model is self.strong and model is not self.fast else 'fast')
+        if self.hedge_after is None or kwargs.get('stream'):
+            return model.generate_content(prompt, **kwargs)
+        return self._hedged(model, prompt, kwargs)
+
+    def _hedged(self, model, prompt, kwargs):
+        """Run `model`, duplicating the request to the fallback once the deadline passes"""
+        primary = self._pool.submit(model.generate_content, prompt, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done and self._succeeded(primary):
+            return primary.result()
+
+        # Too slow (or failed/invalid): race a hedged request against the primary
+        self._count('hedged')
+        hedge = self._pool.submit(self.fallback.generate_content, prompt, **kwargs)
+        pending = {primary, hedge} - done
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if self._succeeded(future):
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+        # Neither produced a usable response: surface the primary's outcome so the caller can retry
+        return primary.result()
+
+    def _succeeded(self, future):
+        return future.exception() is None and self.validate(future.result())
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
@@ -0,0 +1,135 @@
+import re
+import threading
+
+# Fallback characters-per-token ratio when no tokenizer calibration is available
+CHARS_PER_TOKEN = 4
+
+# Input token limits by model name prefix (longest matching prefix wins)
+CONTEXT_WINDOWS = {
+    'gemini-1.0-pro': 30720,
+    'gemini-pro': 30720,
+    'gemini-1.5-flash': 1048576,
+    'gemini-1.5-pro': 2097152,
+    'gemini-2': 1048576,
+    'gemini-flash': 1048576,
+    'gemini-pro-latest': 1048576,
+    'gemini-3': 1048576,
+}
+
+# Used for unknown models, small enough for any Gemini model
+DEFAULT_CONTEXT_WINDOW = 30720
+
+# Tokens kept free for the response
+DEFAULT_OUTPUT_RESERVE = 8192
+
+# Longer comments (pasted logs, rants) are cut down to this many tokens
+DEFAULT_MAX_COMMENT_TOKENS = 300
+
+# Comments joined into the sample sent to `count_tokens` when calibrating
+CALIBRATION_SAMPLE_COMMENTS = 200
+
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+# Sign-offs that start a new line and run to the end of the comment
+SIGNATURE_PATTERN = re.compile(
+    r'\n\s*(?:--\s*\n|_{3,}|(?:best|kind|warm)?\s*regards\b|thanks,?\s*\n|cheers,?\s*\n|sent from my\b).*$',
+    re.IGNORECASE | re.DOTALL
+)
+MOBILE_FOOTER_PATTERN = re.compile(r'\s*sent from my \w+(?: \w+)?\s*$', re.IGNORECASE)
+REPEATED_CHARS_PATTERN = re.compile(r'(.)\1{4,}')
+
+# Character runs ("!!!!!!", "======") are only collapsed in comments longer than this
+LONG_COMMENT_CHARS = 200
+
+_calibrations = {}
+_calibration_lock = threading.Lock()
+
+
+def context_window(model_name):
+    """Input token limit for a model name (with or without the 'models/' prefix)"""
+    name = model_name.replace('models/', '')
+    matches = [prefix for prefix in CONTEXT_WINDOWS if name.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+def strip_boilerplate(comment):
+    """Remove signatures, mobile footers, URLs, e-mail addresses and character runs"""
+    # Cheap substring checks keep the regexes off the common, clean comment
+    multiline = '\n' in comment
+    if multiline:
+        comment = SIGNATURE_PATTERN.sub('', comment)
+    if 'ent from my' in comment:
+        comment = MOBILE_FOOTER_PATTERN.sub('', comment)
+    if '://' in comment or 'www.' in comment:
+        comment = URL_PATTERN.sub('[link]', comment)
+    if '@' in comment:
+        comment = EMAIL_PATTERN.sub('[email]', comment)
+    if len(comment) > LONG_COMMENT_CHARS:
+        comment = REPEATED_CHARS_PATTERN.sub(r'\1\1\1', comment)
+    if multiline or '  ' in comment or '\t' in comment or '\r' in comment:
+        # Folds multi-line pastes (logs, stack traces) onto one prompt line
+        comment = ' '.join(comment.split())
+    return comment
+
+
+class PromptBudget:
+    def __init__(self, model_name='gemini-flash-latest', max_comment_tokens=DEFAULT_MAX_COMMENT_TOKENS,
+                 strip=True, output_reserve=DEFAULT_OUTPUT_RESERVE, window=None, count_tokens=None):
+        """
+        Local token counting and prompt compaction for one model
+
+        Tokens are estimated from a characters-per-token ratio. If
+        `count_tokens` (e.g. `GenerativeModel.count_tokens`) is given, the
+        ratio is calibrated once per model and process from a sample of
+        comments, so only a single API call is made. `window` overrides the
+        model's context window from `CONTEXT_WINDOWS`. Set
+        `max_comment_tokens=None` or `strip=False` to send comments unchanged.
+        """
+        self.model_name = model_name
+        self.max_comment_tokens = max_comment_tokens
+        self.strip = strip
+        self.output_reserve = output_reserve
+        self.window = window or context_window(model_name)
+        self.count_tokens = count_tokens
+        self.chars_per_token = _calibrations.get(model_name, CHARS_PER_TOKEN)
+
+    def calibrate(self, comments):
+        """Fit the characters-per-token ratio with one `count_tokens` call (cached per model)"""
+        if self.count_tokens is None:
+            return
+        with _calibration_lock:
+            if self.model_name not in _calibrations:
+                sample = '\n'.join(comments[:CALIBRATION_SAMPLE_COMMENTS])
+                ratio = CHARS_PER_TOKEN
+                if sample:
+                    try:
+                        tokens = self.count_tokens(sample).total_tokens
+                        ratio = len(sample) / max(1, tokens)
+                    except Exception as e:
+                        print(f"Error counting tokens, using the default estimate: {e}")
+                _calibrations[self.model_name] = ratio
+            self.chars_per_token = _calibrations[self.model_name]
+
+    def count(self, text):
+        """Estimated token count of `text`"""
+        return int(len(text) / self.chars_per_token) + 1
+
+    def compact(self, comment):
+        """
+        Shrink a comment for the prompt
+
+        Boilerplate is stripped, and comments longer than `max_comment_tokens`
+        keep their beginning and end around a '[...]' marker.
+        """
+        if self.strip:
+            comment = strip_boilerplate(comment)
+        if self.max_comment_tokens and self.count(comment) > self.max_comment_tokens:
+            limit = int(self.max_comment_tokens * self.chars_per_token)
+            head = limit * 2 // 3
+            comment = f"{comment[:head].rstrip()} [...] {comment[-(limit - head):].lstrip()}"
+        return comment
+
+    def batch_tokens(self, requested, overhead_tokens=0):
+        """Per-batch comment budget: `requested`, capped so prompt plus response fit the context window"""
+        available = self.window - self.output_reserve - overhead_tokens
+        return max(1, min(requested, available))
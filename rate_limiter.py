@@ -0,0 +1,61 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        """Token bucket that refills `rate_per_minute` tokens evenly over a minute"""
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them"""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """Combined requests/min and tokens/min limiter; None disables a limit"""
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, token_count):
+        """Wait for quota for one request of roughly `token_count` tokens"""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(token_count)
+
+
+def is_retryable(error):
+    """True for throttling (429) and server-side (5xx) API errors"""
+    code = getattr(error, 'code', None)
+    if not isinstance(code, int):
+        code = getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code == 429 or 500 <= code < 600
+    message = str(error).lower()
+    return '429' in message or 'resource has been exhausted' in message or 'unavailable' in message
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter for the given retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
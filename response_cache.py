@@ -0,0 +1,113 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, disk_path=None, ttl_seconds=None, max_disk_entries=10000):
+        """
+        Two-tier cache for parsed model responses
+
+        An in-memory LRU holds up to `max_entries` values. If `disk_path` is
+        given, values are also persisted to a SQLite file capped at
+        `max_disk_entries` rows (least recently used rows are evicted first).
+        Entries older than `ttl_seconds` are treated as misses in both tiers.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt_version, comments):
+        """Content hash of the model, prompt template version and normalized comments"""
+        normalized = [' '.join(str(c).split()) for c in comments]
+        payload = json.dumps([model_name, prompt_version, [c for c in normalized if c]])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return a fresh copy of the cached value, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    row = None
+                if row is not None:
+                    self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Values are stored serialized so callers can't mutate cached state
+        return json.loads(entry[0])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value in both tiers"""
+        now = time.time()
+        entry = (json.dumps(value), now)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, entry[0], now, now)
+                )
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry and reset the counters"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Cumulative hit/miss counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
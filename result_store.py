@@ -0,0 +1,181 @@
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, run_date TEXT NOT NULL, model TEXT NOT NULL,
+    generated_at TEXT NOT NULL, comment_count INTEGER, insights TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sentiments (
+    run_id TEXT NOT NULL, run_date TEXT NOT NULL, model TEXT NOT NULL,
+    name TEXT NOT NULL, value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS themes (
+    run_id TEXT NOT NULL, run_date TEXT NOT NULL, model TEXT NOT NULL,
+    theme_key TEXT NOT NULL, theme TEXT NOT NULL, count INTEGER NOT NULL, sentiment TEXT
+);
+CREATE TABLE IF NOT EXISTS issues (
+    run_id TEXT NOT NULL, run_date TEXT NOT NULL, model TEXT NOT NULL,
+    issue TEXT NOT NULL, priority TEXT, mentions INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comment_labels (
+    run_id TEXT NOT NULL, run_date TEXT NOT NULL, model TEXT NOT NULL,
+    comment TEXT NOT NULL, sentiment TEXT, themes TEXT
+);
+"""
+
+# Every table is "partitioned" by (run_date, model): queries only touch matching index ranges
+PARTITIONED_TABLES = ('runs', 'sentiments', 'themes', 'issues', 'comment_labels')
+
+
+def _period(freq):
+    """Grouper that buckets runs by period and labels each bucket with its first day"""
+    import pandas as pd
+    # pandas labels weekly bins by their last day unless told otherwise
+    return pd.Grouper(key='run_date', freq=freq, label='left', closed='left')
+
+
+class ResultStore:
+    def __init__(self, path='insights_history.sqlite'):
+        """
+        Append-only SQLite history of analysis runs
+
+        Each run's insights are stored whole plus flattened into sentiment,
+        theme, issue and (optional) per-comment label rows, all indexed by
+        run date and model so trend queries read only the range they need.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        for table in PARTITIONED_TABLES:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_partition ON {table} (run_date, model)")
+        self._db.commit()
+
+    def record_run(self, insights, comment_labels=None):
+        """
+        Append one run to the store
+
+        Args:
+            insights: Insights dictionary as returned by `analyze_feedback`
+            comment_labels: Optional iterable of dicts with 'comment',
+                'sentiment' and 'themes' (list of theme names) keys
+
+        Returns:
+            The new run id
+        """
+        run_id = uuid.uuid4().hex
+        generated_at = insights.get('generated_at') or datetime.now().isoformat()
+        partition = (run_id, generated_at[:10], insights.get('model_used', 'unknown'))
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                partition + (generated_at, insights.get('comment_count'), json.dumps(insights))
+            )
+            self._db.executemany(
+                "INSERT INTO sentiments VALUES (?, ?, ?, ?, ?)",
+                [partition + (s['name'], s['value']) for s in insights.get('sentimentDistribution', [])]
+            )
+            self._db.executemany(
+                "INSERT INTO themes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [partition + (' '.join(str(t['theme']).lower().split()), t['theme'], t['count'], t.get('sentiment'))
+                 for t in insights.get('topThemes', [])]
+            )
+            self._db.executemany(
+                "INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?)",
+                [partition + (i['issue'], i.get('priority'), i['mentions']) for i in insights.get('criticalIssues', [])]
+            )
+            if comment_labels is not None:
+                self._db.executemany(
+                    "INSERT INTO comment_labels VALUES (?, ?, ?, ?, ?, ?)",
+                    (partition + (label['comment'], label.get('sentiment'), json.dumps(label.get('themes', [])))
+                     for label in comment_labels)
+                )
+        return run_id
+
+    def _query(self, table, columns, start=None, end=None, model=None):
+        """Read `columns` from `table` for the requested date range and model"""
+        # pandas is only needed for trend queries, not for recording runs
+        import pandas as pd
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("run_date >= ?")
+            params.append(str(start)[:10])
+        if end is not None:
+            clauses.append("run_date <= ?")
+            params.append(str(end)[:10])
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            frame = pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {table}{where}", self._db, params=params)
+        if 'run_date' in frame:
+            frame['run_date'] = pd.to_datetime(frame['run_date'])
+        return frame
+
+    def list_models(self):
+        """Models that have recorded runs"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT model FROM runs ORDER BY model")]
+
+    def load_runs(self, start=None, end=None, model=None):
+        """Run metadata (without the stored insights JSON) for a date range"""
+        return self._query('runs', ['run_id', 'run_date', 'model', 'generated_at', 'comment_count'], start, end, model)
+
+    def load_insights(self, run_id):
+        """Stored insights dictionary for one run"""
+        with self._lock:
+            row = self._db.execute("SELECT insights FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def theme_trends(self, start=None, end=None, model=None, freq='D', top=10):
+        """
+        Theme mention counts per period
+
+        Args:
+            freq: pandas offset alias for the period, e.g. 'D' or 'W'
+                (weeks run Sunday to Saturday)
+
+        Returns:
+            DataFrame indexed by period start with one column per theme
+            (the `top` themes by total count)
+        """
+        import pandas as pd
+        themes = self._query('themes', ['run_date', 'theme_key', 'theme', 'count'], start, end, model)
+        if themes.empty:
+            return pd.DataFrame()
+        # Themes are matched case-insensitively; the most common spelling labels the column
+        labels = themes.groupby('theme_key')['theme'].agg(lambda names: names.mode().iloc[0])
+        trends = (themes.groupby([_period(freq), 'theme_key'])['count'].sum()
+                  .unstack(fill_value=0))
+        leaders = trends.sum().nlargest(top).index
+        return trends[leaders].rename(columns=labels)
+
+    def sentiment_drift(self, start=None, end=None, model=None, freq='W'):
+        """
+        Share of each sentiment per period
+
+        Args:
+            freq: pandas offset alias for the period (see `theme_trends`)
+
+        Returns:
+            DataFrame indexed by period start with Positive/Negative/Neutral
+            columns holding fractions of that period's comments
+        """
+        import pandas as pd
+        sentiments = self._query('sentiments', ['run_date', 'name', 'value'], start, end, model)
+        if sentiments.empty:
+            return pd.DataFrame()
+        totals = (sentiments.groupby([_period(freq), 'name'])['value'].sum()
+                  .unstack(fill_value=0))
+        return totals.div(totals.sum(axis=1).replace(0, 1), axis=0)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
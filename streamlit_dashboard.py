@@ -1,17 +1,25 @@
 import streamlit as st
-from feedback_analyzer import FeedbackAnalyzer
-import json
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+from dashboard_render import (MAX_ISSUE_CARDS, build_comparison_json, build_group_sentiment_figure,
+                              build_insights_json, build_issues_table, build_sentiment_figure, build_text_report,
+                              build_theme_delta_figure, build_themes_figure, insights_fingerprint, memoized)
+from dashboard_resources import (clear_resources, get_analyzer, get_instrumentation, get_job_queue, get_result_store,
+                                 key_fingerprint, list_models, load_sentiment_drift, load_theme_trends,
+                                 run_analysis_job)
+from instrumentation import STAGES
+from io import BytesIO
+from datetime import date, timedelta
+from feedback_ingest import FILE_STRUCTURES, detect_encoding, iter_comments, read_csv_columns, read_csv_preview
+from functools import partial
+from itertools import islice
 import time
 import sys
-from streamlit.web import cli as stcli
+
+# pandas and plotly are imported where they are used, so the first page renders without them
 
 if __name__ == "__main__":
     try:
         from streamlit.runtime.scriptrunner import get_script_run_ctx
+        from streamlit.web import cli as stcli
         if not get_script_run_ctx():
             sys.argv = ["streamlit", "run", sys.argv[0]]
             sys.exit(stcli.main())
@@ -47,8 +55,21 @@ def check_timeout():
         # Clear sensitive data from memory
         if 'insights' in st.session_state:
             del st.session_state.insights
+        if 'insights_fingerprint' in st.session_state:
+            del st.session_state.insights_fingerprint
         if 'feedback_text' in st.session_state:
             del st.session_state.feedback_text
+        if 'feedback_source' in st.session_state:
+            del st.session_state.feedback_source
+        if 'comment_labels' in st.session_state:
+            del st.session_state.comment_labels
+        if 'comparison' in st.session_state:
+            del st.session_state.comparison
+        if 'last_run_metrics' in st.session_state:
+            del st.session_state.last_run_metrics
+        # A running analysis job keeps going; it can be reloaded (with the same API key) from the page URL
+        if 'job_id' in st.session_state:
+            del st.session_state.job_id
             
         st.warning("⚠️ Session timed out due to inactivity (5 minutes). Data has been cleared.")
         if st.button("Restart Session"):
@@ -67,6 +88,25 @@ if 'insights' not in st.session_state:
 if 'feedback_text' not in st.session_state:
     st.session_state.feedback_text = ""
 
+# Uploaded file selected via 'Use this data'; it is streamed at analysis time
+if 'feedback_source' not in st.session_state:
+    st.session_state.feedback_source = None
+
+# Per-comment labels of the last analysis (only in per-comment mode)
+if 'comment_labels' not in st.session_state:
+    st.session_state.comment_labels = None
+
+# Group comparison of the last analysis (only when comparing groups of an uploaded CSV)
+if 'comparison' not in st.session_state:
+    st.session_state.comparison = None
+
+# Background analysis job being polled (also kept in the URL so a reload can reattach)
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+
+# How often the job status panel refreshes
+JOB_POLL_SECONDS = 1.0
+
 
 
 # Header
@@ -79,12 +119,29 @@ with st.expander("� Configuration", expanded=True):
     with col1:
         api_key = st.text_input("Gemini API Key", type="password", 
                                  help="Enter your Google Gemini API key")
+        use_local_fast_path = st.checkbox(
+            "⚡ Classify simple comments locally",
+            help="Short, clearly positive comments (e.g. 'Love it!') are labelled without calling the API"
+        )
+        use_clustering = st.checkbox(
+            "🧩 Cluster similar comments",
+            help="For large datasets: only one representative per group of similar comments is sent to the model"
+        )
+        per_comment = st.checkbox(
+            "🏷️ Label each comment",
+            help="Ask the model for a label per comment; counts are computed locally and can be filtered without new API calls"
+        )
+        save_history = st.checkbox(
+            "📜 Save results to history",
+            help="Store this analysis's aggregated insights in a local database for trend views"
+        )
     
     with col2:
         model_name = "gemini-flash-latest"
+        available_models = []
         if api_key:
             with st.spinner("Fetching models..."):
-                available_models = FeedbackAnalyzer.list_available_models(api_key)
+                available_models = list_models(api_key)
                 if available_models:
                     # Try to set default to flash if available
                     default_index = 0
@@ -96,6 +153,20 @@ with st.expander("� Configuration", expanded=True):
         else:
             st.selectbox("Select Model", ["Enter API Key first"], disabled=True)
 
+        strong_model = None
+        use_routing = st.checkbox(
+            "🔀 Route large/ambiguous batches to a stronger model",
+            help="Clear-cut batches stay on the selected model; very large or mostly ambiguous ones go to the stronger model"
+        )
+        if use_routing and available_models:
+            default_index = next((i for i, m in enumerate(available_models) if 'pro' in m.lower()), 0)
+            strong_model = st.selectbox("Strong Model", available_models, index=default_index)
+        hedge_after = st.number_input(
+            "Hedge slow requests after (s)", min_value=0.0, max_value=120.0, value=0.0, step=1.0,
+            help="Send a duplicate request when a call takes longer than this and use whichever answers first "
+                 "(0 = off). Uses extra quota."
+        ) or None
+
 # Sidebar for API key
 with st.sidebar:
     st.markdown("### 📖 How to use")
@@ -108,6 +179,9 @@ with st.sidebar:
     4. **Analyze**: Click '🚀 Analyze Feedback'.
     5. **Review**: Scroll down to see generated insights.
     """)
+    st.button("🔄 Refresh models", on_click=clear_resources,
+              help="Fetch the model list again and reset pooled API clients")
+    show_debug = st.checkbox("🛠️ Show debug panel", help="Stage timings, token usage and retries")
 
 # Sample data
 sample_feedback = """The new update is amazing! Love the dark mode feature.
@@ -130,17 +204,23 @@ Really impressed with the recent improvements."""
 tab1, tab2 = st.tabs(["📝 Enter Feedback", "📁 Upload CSV"])
 
 with tab1:
+    # Callbacks
+    def use_pasted_feedback():
+        st.session_state.feedback_source = None
+
+    def load_sample_data():
+        st.session_state.feedback_text = sample_feedback
+        st.session_state.feedback_source = None
+
     col1, col2 = st.columns([3, 1])
     with col1:
         feedback_text = st.text_area(
             "Enter feedback (one per line)",
             height=150,
             placeholder="Paste your feedback here...",
-            key="feedback_text"
+            key="feedback_text",
+            on_change=use_pasted_feedback
         )
-    # Callbacks
-    def load_sample_data():
-        st.session_state.feedback_text = sample_feedback
 
     with col2:
         st.write("")
@@ -154,7 +234,7 @@ with tab2:
         st.subheader("File Settings")
         file_structure = st.radio(
             "File Structure",
-            ["Standard CSV", "Comma Separated", "One Comment Per Line"],
+            FILE_STRUCTURES,
             help="Select how your data is structured"
         )
         
@@ -167,83 +247,186 @@ with tab2:
         uploaded_file = st.file_uploader("Choose a file", type=['csv', 'txt'])
     
     if uploaded_file:
+        # Only a prefix is decoded here; the full file is streamed at analysis time
+        encoding = detect_encoding(uploaded_file)
         df = None
-        
-        # Helper to read content with fallback encoding
-        def read_content(file):
-            file.seek(0)
-            try:
-                return file.read().decode('utf-8')
-            except UnicodeDecodeError:
-                file.seek(0)
-                return file.read().decode('cp1252', errors='replace')
+        feedback_col = None
+        group_col = None
 
         if file_structure == "Standard CSV":
             try:
-                try:
-                    df = pd.read_csv(uploaded_file)
-                except UnicodeDecodeError:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding='cp1252')
+                df = read_csv_preview(uploaded_file, encoding=encoding)
             except Exception:
-                # Fallback for CSV
-                content = read_content(uploaded_file)
-                lines = [line.strip().strip('"').strip() for line in content.split('\n') if line.strip()]
-                df = pd.DataFrame(lines, columns=['feedback'])
                 st.warning("⚠️ CSV parsing failed. Loaded file as plain text list.")
-                
-        elif file_structure == "Comma Separated":
-            content = read_content(uploaded_file)
-            # Split by comma and clean up
-            comments = [c.strip().strip('"').strip() for c in content.split(',') if c.strip()]
-            df = pd.DataFrame(comments, columns=['feedback'])
-            
-        elif file_structure == "One Comment Per Line":
-            content = read_content(uploaded_file)
-            lines = [line.strip() for line in content.split('\n')]
-            # Apply start line (convert 1-based to 0-based index)
-            if start_line <= len(lines):
-                comments = [l for l in lines[start_line-1:] if l.strip()]
-                df = pd.DataFrame(comments, columns=['feedback'])
+
+        if df is None:
+            preview = list(islice(iter_comments(uploaded_file, file_structure, start_line=start_line,
+                                                encoding=encoding), 5))
+            if preview:
+                import pandas as pd
+                df = pd.DataFrame(preview, columns=['feedback'])
+            elif file_structure == "One Comment Per Line":
+                st.error(f"No comments found from line {start_line} to the end of the file.")
             else:
-                st.error(f"Start line {start_line} is beyond the end of the file ({len(lines)} lines).")
+                st.error("No comments found in the file.")
+        elif len(df.columns) > 1:
+            # Get column for feedback (only if multiple columns exist, otherwise default to first)
+            feedback_col = st.selectbox("Select feedback column", df.columns)
+            group_choice = st.selectbox(
+                "Compare groups by (optional)", ["None"] + [c for c in df.columns if c != feedback_col],
+                help="Pick a column such as version, region or channel to compare its groups side by side. "
+                     "Each comment is labeled once and the groups are compared locally."
+            )
+            group_col = None if group_choice == "None" else group_choice
+        else:
+            feedback_col = df.columns[0]
+            st.info(f"Using column '{feedback_col}' for feedback.")
         
         if df is not None:
             st.dataframe(df.head())
             
-            # Get column for feedback (only if multiple columns exist, otherwise default to first)
-            if len(df.columns) > 1:
-                feedback_col = st.selectbox("Select feedback column", df.columns)
-            else:
-                feedback_col = df.columns[0]
-                st.info(f"Using column '{feedback_col}' for feedback.")
+            def load_file_data(file, structure, line, col, group):
+                st.session_state.feedback_source = {
+                    'file': file, 'name': file.name, 'structure': structure,
+                    'start_line': line, 'column': col, 'encoding': encoding, 'group_by': group
+                }
+                st.session_state.feedback_text = ""
             
-            def load_csv_data(dataframe, col):
-                st.session_state.feedback_text = '\n'.join(dataframe[col].astype(str).tolist())
+            st.button("Use this data", on_click=load_file_data,
+                      args=(uploaded_file, file_structure, start_line, feedback_col, group_col))
             
-            st.button("Use this data", on_click=load_csv_data, args=(df, feedback_col))
-            
-            if st.session_state.feedback_text and len(df) > 0 and st.session_state.feedback_text.startswith(str(df[feedback_col].iloc[0])[:20]):
-                 st.success(f"Loaded {len(df)} feedback comments into the analysis tab.")
+            source = st.session_state.feedback_source
+            if source and source['name'] == uploaded_file.name:
+                 st.success(f"Loaded '{source['name']}' for analysis. Comments are read from the file when you click Analyze.")
+
+def render_live_section(container, section, value):
+    """Show one insights section while the rest of the response is still streaming"""
+    with container:
+        if section == 'summary':
+            st.subheader("📊 Executive Summary")
+            st.info(value)
+        elif section == 'sentimentDistribution' and value:
+            st.subheader("Sentiment Distribution")
+            fig = build_sentiment_figure({'sentimentDistribution': value})
+            st.plotly_chart(fig, use_container_width=True, key="live_sentiment_chart")
+        elif section == 'topThemes' and value:
+            st.subheader("Top Themes")
+            st.dataframe(value[:5], use_container_width=True)
+        elif section == 'criticalIssues' and value:
+            st.subheader("🚨 Critical Issues")
+            for issue in value:
+                st.markdown(f"- **{issue['issue']}** `{issue['priority'].upper()}` ({issue['mentions']} mentions)")
+        elif section == 'recommendations' and value:
+            st.subheader("💡 AI Recommendations")
+            for i, rec in enumerate(value, 1):
+                st.success(f"{i}. {rec}")
 
 # Analyze button
 if st.button("🚀 Analyze Feedback", type="primary", use_container_width=True):
     if not api_key:
         st.error("Please enter your Gemini API key in the sidebar")
-    elif not st.session_state.feedback_text:
+    elif not st.session_state.feedback_text and not st.session_state.feedback_source:
         st.error("Please enter some feedback to analyze")
     else:
-        with st.spinner("Analyzing feedback with AI..."):
-            try:
-                analyzer = FeedbackAnalyzer(api_key=api_key, model_name=model_name)
-                insights = analyzer.analyze_feedback(st.session_state.feedback_text)
-                st.session_state.insights = insights
-                st.success("Analysis complete!")
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+        try:
+            analyzer = get_analyzer(api_key, model_name, use_local_fast_path, use_clustering, strong_model,
+                                    hedge_after)
+            source = st.session_state.feedback_source
+            group_by = source.get('group_by') if source else None
+            if group_by:
+                # The two columns are read by the worker, not the script thread
+                feedback = partial(read_csv_columns, BytesIO(source['file'].getvalue()),
+                                   [source['column'], group_by], encoding=source['encoding'])
+                description = f"{source['name']} by {group_by}"
+            elif source:
+                # Each job reads its own view of the upload, so reruns and other jobs can't move its position
+                feedback = iter_comments(BytesIO(source['file'].getvalue()), source['structure'],
+                                         start_line=source['start_line'], column=source['column'],
+                                         encoding=source['encoding'])
+                description = source['name']
+            else:
+                feedback = st.session_state.feedback_text
+                description = "Pasted feedback"
+            history = get_result_store() if save_history else None
+            job_id = get_job_queue().submit(run_analysis_job, analyzer, feedback, per_comment, history, group_by,
+                                            owner=key_fingerprint(api_key), description=description)
+            st.session_state.job_id = job_id
+            st.query_params['job'] = job_id
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
+# Reattach to the job in the URL after a reload or session timeout (only for the API key that started it)
+url_job = st.query_params.get('job')
+if url_job and not st.session_state.job_id and api_key:
+    job = get_job_queue().status(url_job)
+    if job is None:
+        del st.query_params['job']
+    elif job['owner'] == key_fingerprint(api_key):
+        st.session_state.job_id = url_job
+
+
+def finish_job(job_id, job):
+    """Load a finished job's results into the session"""
+    st.session_state.job_id = None
+    if 'job' in st.query_params:
+        del st.query_params['job']
+    if job['status'] == 'done':
+        result = get_job_queue().result(job_id)
+        if result is None:
+            st.session_state.job_notice = ('warning', "The analysis job has expired")
+            return
+        st.session_state.insights = result['insights']
+        st.session_state.insights_fingerprint = insights_fingerprint(result['insights'])
+        st.session_state.comment_labels = result['labels']
+        st.session_state.comparison = result.get('comparison')
+        if st.session_state.comparison:
+            st.session_state.comparison_fingerprint = insights_fingerprint(st.session_state.comparison)
+        st.session_state.last_run_metrics = result['metrics']
+        st.session_state.job_notice = ('success', "Analysis complete!")
+    elif job['status'] == 'cancelled':
+        st.session_state.job_notice = ('info', "Analysis cancelled")
+    else:
+        st.session_state.job_notice = ('error', f"Error: {job['error']}")
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_panel(job_id):
+    """Poll a background analysis job, showing progress and streamed sections until it finishes"""
+    job_queue = get_job_queue()
+    job = job_queue.status(job_id)
+    if job is None:
+        st.session_state.job_id = None
+        st.warning("The analysis job has expired")
+        return
+    if job['status'] not in ('queued', 'running'):
+        finish_job(job_id, job)
+        st.rerun()
+
+    # Watching a job counts as activity, so long runs don't time out before their results are shown
+    st.session_state.last_active = time.time()
+    if job['status'] == 'queued':
+        st.progress(0.0, text="Waiting for a free worker...")
+    elif job['total']:
+        st.progress(min(1.0, job['done'] / job['total']), text=f"Analyzing: {job['done']}/{job['total']} batches")
+    else:
+        st.progress(0.0, text=f"Analyzing: {job['done']} batches done")
+    if st.button("✖️ Cancel analysis"):
+        job_queue.cancel(job_id)
+    live_container = st.container()
+    for section, value in job['partial'].items():
+        render_live_section(live_container, section, value)
+
+
+if st.session_state.job_id:
+    job_panel(st.session_state.job_id)
+
+if 'job_notice' in st.session_state:
+    kind, message = st.session_state.pop('job_notice')
+    getattr(st, kind)(message)
 
 # Display insights
 if st.session_state.insights:
+    render_start = time.perf_counter()
     insights = st.session_state.insights
     
     st.markdown("---")
@@ -257,7 +440,7 @@ if st.session_state.insights:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        total_feedback = len(feedback_text.split('\n'))
+        total_feedback = insights.get('comment_count', len(feedback_text.split('\n')))
         st.metric("Total Feedback", total_feedback, help="Number of comments analyzed")
     
     with col2:
@@ -268,35 +451,24 @@ if st.session_state.insights:
         issues = len(insights['criticalIssues'])
         st.metric("Critical Issues", issues, delta=f"-{issues}", delta_color="inverse", help="Issues requiring attention")
     
+    # Figures and exports are built once per analysis and reused across reruns
+    fingerprint = st.session_state.get('insights_fingerprint') or insights_fingerprint(insights)
+
     # Charts
     st.header("📊 Visual Insights")
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Sentiment Distribution")
-        sentiment_df = pd.DataFrame(insights['sentimentDistribution'])
-        fig = px.pie(sentiment_df, values='value', names='name', 
-                     color='name',
-                     color_discrete_map={'Positive': '#10b981', 'Negative': '#ef4444', 'Neutral': '#6b7280'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(memoized(build_sentiment_figure, insights, fingerprint), use_container_width=True)
     
     with col2:
         st.subheader("Top Themes")
-        themes_df = pd.DataFrame(insights['topThemes'][:5])
-        fig = px.bar(themes_df, x='theme', y='count', 
-                     color='sentiment',
-                     color_discrete_map={'positive': '#10b981', 'negative': '#ef4444', 'neutral': '#6b7280'})
-        fig.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(memoized(build_themes_figure, insights, fingerprint), use_container_width=True)
     
     # Critical Issues
     st.header("🚨 Critical Issues")
-    for issue in insights['criticalIssues']:
-        priority_color = {
-            'high': 'error',
-            'medium': 'warning',
-            'low': 'info'
-        }
+    for issue in insights['criticalIssues'][:MAX_ISSUE_CARDS]:
         with st.container():
             col1, col2 = st.columns([5, 1])
             with col1:
@@ -305,57 +477,168 @@ if st.session_state.insights:
                 st.markdown(f"`{issue['priority'].upper()}`")
             st.caption(f"📊 {issue['mentions']} mentions")
         st.markdown("---")
+    if len(insights['criticalIssues']) > MAX_ISSUE_CARDS:
+        with st.expander(f"{len(insights['criticalIssues']) - MAX_ISSUE_CARDS} more issues"):
+            st.dataframe(memoized(build_issues_table, insights, fingerprint), use_container_width=True)
     
     # Recommendations
     st.header("💡 AI Recommendations")
     for i, rec in enumerate(insights['recommendations'], 1):
         st.success(f"{i}. {rec}")
+
+    # Drill-down into per-comment labels (filters are applied locally, no API calls)
+    labels = st.session_state.comment_labels
+    if labels is not None:
+        with st.expander("🔎 Explore Labeled Comments"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sentiment_filter = st.selectbox("Sentiment", ["All", "positive", "negative", "neutral"])
+            with col2:
+                theme_filter = st.selectbox("Theme", ["All"] + labels.themes())
+            with col3:
+                issue_filter = st.selectbox("Issue", ["All"] + labels.issues())
+            selected = labels.select(
+                sentiment=None if sentiment_filter == "All" else sentiment_filter,
+                theme=None if theme_filter == "All" else theme_filter,
+                issue=None if issue_filter == "All" else issue_filter
+            )
+            counts = selected.aggregate()
+            st.caption(f"{counts['comment_count']} comments · " + " · ".join(
+                f"{s['name']}: {s['value']}" for s in counts['sentimentDistribution']))
+            st.dataframe(selected.to_frame(), use_container_width=True, hide_index=True)
         
+    # Group comparison
+    comparison = st.session_state.comparison
+    if comparison:
+        import pandas as pd
+        comparison_fingerprint = st.session_state.get('comparison_fingerprint') or insights_fingerprint(comparison)
+        reference = f"Group '{comparison['baseline']}'" if comparison['baseline'] else "All Comments"
+        st.header(f"🆚 Comparison by {comparison['group_by']}")
+        st.dataframe(pd.DataFrame([
+            {'group': key, 'comments': group['comment_count'],
+             'critical issues': len(group['criticalIssues']),
+             'top theme': group['topThemes'][0]['theme'] if group['topThemes'] else ''}
+            for key, group in comparison['groups'].items()
+        ]), use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Sentiment by Group")
+            st.plotly_chart(memoized(build_group_sentiment_figure, comparison, comparison_fingerprint),
+                            use_container_width=True)
+        with col2:
+            st.subheader(f"Theme Share vs. {reference}")
+            if comparison['themeDeltas']:
+                st.plotly_chart(memoized(build_theme_delta_figure, comparison, comparison_fingerprint),
+                                use_container_width=True)
+            else:
+                st.caption("No themes found")
+
+        st.subheader("Issues Unique to One Group")
+        if comparison['uniqueIssues']:
+            st.dataframe(pd.DataFrame(comparison['uniqueIssues']), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Every issue was mentioned in more than one group")
+
+        for key, group in comparison['groups'].items():
+            with st.expander(f"📝 {key}: summary and recommendations"):
+                st.info(group['summary'])
+                for i, rec in enumerate(group['recommendations'], 1):
+                    st.markdown(f"{i}. {rec}")
+
+        st.download_button(
+            "Download Comparison JSON",
+            lambda: memoized(build_comparison_json, comparison, comparison_fingerprint),
+            "comparison.json",
+            "application/json"
+        )
+
     # Metadata Footer
     st.markdown("---")
     if 'model_used' in insights:
-        st.caption(f"🤖 Generated with **{insights['model_used']}** on {insights.get('generated_at', 'Unknown Date')} in {insights.get('execution_time', '0')}s")
+        cache_note = ""
+        if insights.get('cache', {}).get('hits'):
+            cache_note = f" · ⚡ {insights['cache']['hits']} cached / {insights['cache']['misses']} new calls"
+        if 'local_fraction' in insights:
+            cache_note += f" · ⚡ {insights['local_fraction']:.0%} of comments classified locally"
+        st.caption(f"🤖 Generated with **{insights['model_used']}** on {insights.get('generated_at', 'Unknown Date')} in {insights.get('execution_time', '0')}s{cache_note}")
     
-    # Export options
+    # Export options (payloads are generated only when a button is clicked)
     st.header("💾 Export Results")
     col1, col2 = st.columns(2)
     
     with col1:
-        insights_json = json.dumps(insights, indent=2)
         st.download_button(
             "Download JSON",
-            insights_json,
+            lambda: memoized(build_insights_json, insights, fingerprint),
             "insights.json",
             "application/json",
             use_container_width=True
         )
     
     with col2:
-        # Create summary report
-        report = f"""FEEDBACK ANALYSIS REPORT
-Generated: {insights.get('generated_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}
-Model: {insights.get('model_used', 'Unknown')}
-Execution Time: {insights.get('execution_time', '0')}s
-
-SUMMARY:
-{insights['summary']}
-
-SENTIMENT DISTRIBUTION:
-{chr(10).join([f"- {s['name']}: {s['value']}" for s in insights['sentimentDistribution']])}
-
-TOP THEMES:
-{chr(10).join([f"{i+1}. {t['theme']} ({t['count']} mentions)" for i, t in enumerate(insights['topThemes'][:5])])}
-
-CRITICAL ISSUES:
-{chr(10).join([f"- [{i['priority'].upper()}] {i['issue']} ({i['mentions']} mentions)" for i in insights['criticalIssues']])}
-
-RECOMMENDATIONS:
-{chr(10).join([f"{i+1}. {r}" for i, r in enumerate(insights['recommendations'])])}
-"""
         st.download_button(
             "Download Report",
-            report,
+            lambda: memoized(build_text_report, insights, fingerprint),
             "report.txt",
             "text/plain",
             use_container_width=True
         )
+    get_instrumentation().record('render', time.perf_counter() - render_start)
+
+# History view (only queried when switched on)
+st.markdown("---")
+if st.toggle("📜 Show analysis history"):
+    store = get_result_store()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        history_range = st.date_input("Date range", (date.today() - timedelta(days=30), date.today()))
+    with col2:
+        history_model = st.selectbox("Model", ["All models"] + store.list_models())
+    with col3:
+        history_freq = st.radio("Group by", ["Day", "Week"], horizontal=True)
+
+    if len(history_range) == 2:
+        start, end = history_range
+        model_filter = None if history_model == "All models" else history_model
+        freq = 'D' if history_freq == "Day" else 'W'
+        theme_trends = load_theme_trends(start, end, model_filter, freq)
+        sentiment_drift = load_sentiment_drift(start, end, model_filter, freq)
+        if theme_trends.empty and sentiment_drift.empty:
+            st.info("No saved analyses in this range. Tick 'Save results to history' before analyzing.")
+        else:
+            st.subheader("Theme Mentions Over Time")
+            st.line_chart(theme_trends)
+            st.subheader("Sentiment Share Over Time")
+            st.area_chart(sentiment_drift)
+
+# Debug panel: where time and tokens go
+if show_debug:
+    st.markdown("---")
+    st.header("🛠️ Debug")
+    instrumentation = get_instrumentation()
+    totals = instrumentation.snapshot()
+    last_run = st.session_state.get('last_run_metrics')
+
+    def stage_table(snapshot):
+        import pandas as pd
+        rows = [{'stage': stage, 'calls': stats['count'], 'seconds': round(stats['total_seconds'], 3)}
+                for stage, stats in snapshot['stages'].items()]
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return pd.DataFrame(rows, columns=['stage', 'calls', 'seconds']).sort_values(
+            'stage', key=lambda column: column.map(lambda stage: order.get(stage, len(order))))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Last analysis")
+        if last_run:
+            st.dataframe(stage_table(last_run), use_container_width=True, hide_index=True)
+            st.json({'tokens': last_run['tokens'], 'counters': last_run['counters']})
+        else:
+            st.caption("Run an analysis to see its breakdown")
+    with col2:
+        st.subheader("Since server start")
+        st.dataframe(stage_table(totals), use_container_width=True, hide_index=True)
+        st.json({'tokens': totals['tokens'], 'counters': totals['counters']})
+    with st.expander("Prometheus metrics"):
+        st.code(instrumentation.to_prometheus(), language="text")
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter, so pandas is not imported yet when the worker threads start
+RUNNER_SCRIPT = """
+import sys
+from benchmark import fake_gemini
+from batch_runner import main
+with fake_gemini():
+    sys.exit(main(sys.argv[1:]))
+"""
+
+
+@pytest.mark.parametrize('run', range(3))
+def test_parallel_first_run_analyzes_every_file(tmp_path, run):
+    inputs = tmp_path / 'in'
+    inputs.mkdir()
+    for name in ('a.csv', 'b.csv'):
+        (inputs / name).write_text("id,feedback\n1,App crashes on start\n2,Love the new design\n")
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', RUNNER_SCRIPT, str(inputs), '--output-dir', str(tmp_path / 'out'),
+         '--jobs', '2', '--api-key', 'fake'],
+        cwd=REPO, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(tmp_path / 'out')) == ['a.csv.insights.json', 'b.csv.insights.json',
+                                                   'rollup.insights.json']
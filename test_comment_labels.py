@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from benchmark import FakeGenerativeModel
+from feedback_analyzer import FeedbackAnalyzer
+
+
+def concatenated_frame():
+    """Two segments concatenated without ignore_index, so the index repeats"""
+    first = pd.DataFrame({'feedback': ["App crashes on start", "Love the new design", None],
+                          'segment': ['web', 'web', 'web']})
+    second = pd.DataFrame({'feedback': ["Sync is too slow", "  ", "Great support team"],
+                           'segment': ['mobile', 'mobile', 'mobile']})
+    return pd.concat([first, second])
+
+
+def test_label_feedback_keeps_rows_of_a_duplicate_index():
+    labels = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel()).label_feedback(concatenated_frame())
+    assert list(labels.frame.index) == [0, 1, 0, 2]
+    assert list(labels.frame['comment']) == ["App crashes on start", "Love the new design", "Sync is too slow",
+                                             "Great support team"]
+    assert list(labels.frame['segment']) == ['web', 'web', 'mobile', 'mobile']
+
+
+def test_groupby_uses_positions_not_index_labels():
+    labels = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel()).label_feedback(concatenated_frame())
+    groups = labels.groupby('segment')
+    assert {key: insights['comment_count'] for key, insights in groups.items()} == {'mobile': 2, 'web': 2}
+    assert sum(item['value'] for item in groups['web']['sentimentDistribution']) == 2
+
+
+def test_compare_groups_by_segment():
+    comparison = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel()).compare_groups(
+        concatenated_frame(), 'segment')
+    assert set(comparison['groups']) == {'web', 'mobile'}
+    assert comparison['overall']['comment_count'] == 4
+
+
+@pytest.mark.parametrize('frame, by, column', [
+    (concatenated_frame(), 'feedback', None),
+    (concatenated_frame().rename(columns={'feedback': 'text'}), 'text', None),
+    (concatenated_frame().rename(columns={'feedback': 'text'}), 'text', 'text'),
+    (concatenated_frame().assign(text='x'), 'feedback', 'text'),
+])
+def test_compare_groups_rejects_the_feedback_column(frame, by, column):
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel())
+    with pytest.raises(ValueError, match="feedback column"):
+        analyzer.compare_groups(frame, by, column=column)
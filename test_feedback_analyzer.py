@@ -0,0 +1,142 @@
+import json
+
+from benchmark import FakeGenerativeModel, FakeResponse, fake_gemini, generate_corpus
+from feedback_analyzer import FeedbackAnalyzer, merge_insights
+from feedback_clustering import FeedbackClusterer
+from instrumentation import Instrumentation
+from local_classifier import LocalClassifier
+from model_router import ModelRouter
+from response_cache import ResponseCache
+
+
+class NoSummaryModel(FakeGenerativeModel):
+    """Fake model that never returns a summary, so repairing that field fails"""
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        data = json.loads(super().generate_content(prompt, generation_config=generation_config).text)
+        if not prompt.startswith("The following aggregated insights"):
+            data.pop('summary', None)
+        return FakeResponse(json.dumps(data))
+
+
+def test_unrepaired_fields_are_left_empty_without_internal_markers():
+    for cache in (None, ResponseCache()):
+        analyzer = FeedbackAnalyzer(api_key='fake', model=NoSummaryModel(), cache=cache)
+        insights = analyzer.analyze_feedback(["App crashes on start", "Love the new design"])
+        assert insights['summary'] == ''
+        assert insights['topThemes']
+        assert not any(key.startswith('_') for key in insights)
+
+
+def test_string_input_is_split_into_lines_not_characters():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel())
+    assert analyzer.normalize_feedback("The app crashes") == [("The app crashes", 1)]
+    assert analyzer.normalize_feedback("App crashes\n\nLove it\napp crashes!") == [("App crashes", 2), ("Love it", 1)]
+    assert analyzer.analyze_feedback("The app crashes")['comment_count'] == 1
+
+
+def test_normalize_feedback_accepts_iterators_and_skips_blanks():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel())
+    comments = iter(["  Slow sync ", None, "", 42, "slow  sync"])
+    assert analyzer.normalize_feedback(comments) == [("Slow sync", 2), ("42", 1)]
+
+
+PARTIALS = [
+    {
+        'sentimentDistribution': [{'name': 'Positive', 'value': 2}, {'name': 'Negative', 'value': 1}],
+        'topThemes': [{'theme': 'Speed', 'count': 2, 'sentiment': 'negative'},
+                      {'theme': 'Design', 'count': 1, 'sentiment': 'positive'}],
+        'criticalIssues': [{'issue': 'App crashes', 'priority': 'medium', 'mentions': 1}],
+        'trendingTopics': [{'topic': 'dark mode', 'mentions': 1}],
+        'summary': 'First batch.',
+        'recommendations': ['Fix crashes', 'Add dark mode'],
+        'comment_count': 3,
+    },
+    {
+        'sentimentDistribution': [{'name': 'negative', 'value': 4}, {'name': 'Neutral', 'value': 1}],
+        'topThemes': [{'theme': ' speed ', 'count': 3, 'sentiment': 'positive'},
+                      {'theme': 'Pricing', 'count': 1, 'sentiment': 'negative'}],
+        'criticalIssues': [{'issue': 'app  CRASHES', 'priority': 'high', 'mentions': 2}],
+        'trendingTopics': [{'topic': 'Dark Mode', 'mentions': 2}],
+        'summary': 'Second batch.',
+        'recommendations': ['fix crashes'],
+        'comment_count': 5,
+    },
+]
+
+
+def test_merge_insights_sums_matching_labels():
+    merged = merge_insights(PARTIALS)
+    assert merged['sentimentDistribution'] == [
+        {'name': 'Positive', 'value': 2}, {'name': 'Negative', 'value': 5}, {'name': 'Neutral', 'value': 1}
+    ]
+    # First-seen spelling is kept; the sentiment reported with the largest count wins
+    assert merged['topThemes'][0] == {'theme': 'Speed', 'count': 5, 'sentiment': 'positive'}
+    assert merged['criticalIssues'] == [{'issue': 'App crashes', 'priority': 'high', 'mentions': 3}]
+    assert merged['trendingTopics'] == [{'topic': 'dark mode', 'mentions': 3}]
+    assert merged['recommendations'] == ['Fix crashes', 'Add dark mode']
+    assert merged['summary'] == 'First batch.'
+    assert merged['_summaries'] == ['First batch.', 'Second batch.']
+    assert merged['comment_count'] == 8
+
+
+def test_merge_insights_is_deterministic():
+    assert merge_insights(PARTIALS) == merge_insights(json.loads(json.dumps(PARTIALS)))
+    # Ties keep first-seen order
+    assert [t['theme'] for t in merge_insights(PARTIALS)['topThemes']] == ['Speed', 'Design', 'Pricing']
+
+
+def test_merge_insights_totals_do_not_depend_on_order():
+    forward, backward = merge_insights(PARTIALS), merge_insights(PARTIALS[::-1])
+    for field, key in (('topThemes', 'count'), ('criticalIssues', 'mentions'), ('trendingTopics', 'mentions')):
+        assert sorted(item[key] for item in forward[field]) == sorted(item[key] for item in backward[field])
+    assert forward['comment_count'] == backward['comment_count']
+
+
+def test_large_corpus_is_analyzed_in_batches_and_merged():
+    comments = generate_corpus(400)
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel(), batch_tokens=500)
+    insights = analyzer.analyze_feedback(comments)
+    assert insights['batch_count'] > 1
+    assert insights['comment_count'] == len(comments)
+    assert insights['summary'] and insights['recommendations']
+    assert not any(key.startswith('_') for key in insights)
+
+
+def test_incremental_run_folds_new_comments_into_previous_insights():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel())
+    previous = analyzer.analyze_feedback(["App crashes on start", "Love the new design"])
+    updated = analyzer.analyze_incremental(previous, ["Sync is too slow"])
+    assert updated['comment_count'] == 3
+    assert updated['new_comment_count'] == 1
+    assert updated['previous_generated_at'] == previous['generated_at']
+
+
+def test_incremental_run_without_new_comments_returns_previous_insights():
+    model = FakeGenerativeModel()
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model)
+    previous = analyzer.analyze_feedback(["App crashes on start", "Love the new design"])
+    calls = model.calls
+    for new_feedback in ([], "", iter(["  ", None])):
+        updated = analyzer.analyze_incremental(previous, new_feedback)
+        assert model.calls == calls
+        run_metadata = {'execution_time', 'batch_count'}
+        assert {key: value for key, value in updated.items() if key in previous and key not in run_metadata} == \
+            {key: value for key, value in previous.items() if key not in run_metadata}
+        assert updated['new_comment_count'] == 0
+        assert updated['batch_count'] == 0
+        assert updated['previous_generated_at'] == previous['generated_at']
+
+
+def test_from_options_builds_router_classifier_and_clusterer():
+    metrics = Instrumentation()
+    with fake_gemini():
+        analyzer = FeedbackAnalyzer.from_options('fake', 'gemini-flash-latest', strong_model='gemini-pro-latest',
+                                                 local_fast_path=True, cluster=True, instrumentation=metrics)
+        insights = analyzer.analyze_feedback(generate_corpus(50))
+    assert isinstance(analyzer.model, ModelRouter)
+    assert analyzer.model_name == 'gemini-flash-latest → gemini-pro-latest'
+    assert analyzer.model.instrumentation is metrics
+    assert isinstance(analyzer.local_classifier, LocalClassifier)
+    assert isinstance(analyzer.clusterer, FeedbackClusterer)
+    assert insights['comment_count'] == 50
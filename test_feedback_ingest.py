@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from feedback_ingest import iter_comments
+
+CSV = b"id,feedback,region\n1,App crashes on start,EU\n2,Love the new design,US\n"
+
+
+def test_standard_csv_defaults_to_the_feedback_column():
+    assert list(iter_comments(io.BytesIO(CSV))) == ["App crashes on start", "Love the new design"]
+
+
+def test_standard_csv_without_feedback_column_uses_the_first():
+    assert list(iter_comments(io.BytesIO(b"comment,score\nToo slow,2\nGreat,5\n"))) == ["Too slow", "Great"]
+
+
+def test_standard_csv_reads_the_requested_column():
+    assert list(iter_comments(io.BytesIO(CSV), column='region')) == ["EU", "US"]
+
+
+def test_unknown_column_raises_instead_of_reading_raw_lines():
+    with pytest.raises(ValueError, match="Column 'Feedbak' not found.*id, feedback, region"):
+        list(iter_comments(io.BytesIO(CSV), column='Feedbak'))
+
+
+def test_empty_csv_yields_nothing():
+    assert list(iter_comments(io.BytesIO(b""))) == []
+
+
+def test_one_comment_per_line_honours_start_line():
+    text = b"Header line\nFirst comment\n\nSecond comment\n"
+    assert list(iter_comments(io.BytesIO(text), "One Comment Per Line", start_line=2)) == [
+        "First comment", "Second comment"
+    ]
+
+
+def test_comma_separated_splits_across_read_boundaries(monkeypatch):
+    import feedback_ingest
+    monkeypatch.setattr(feedback_ingest, 'TEXT_READ_BYTES', 7)
+    assert list(iter_comments(io.BytesIO(b'"Too slow", Great app ,,Crashes'), "Comma Separated")) == [
+        "Too slow", "Great app", "Crashes"
+    ]
@@ -0,0 +1,149 @@
+import json
+
+import pytest
+
+from benchmark import FakeGenerativeModel, FakeResponse
+from feedback_analyzer import FeedbackAnalyzer
+from insights_schema import INSIGHT_FIELDS, extract_json, repair_truncated_json, validate_insights, validate_labels
+
+ANALYSIS_PROMPT = "Analyze the following user feedback comments\n\nFeedback:\n{}\n\nReturn JSON"
+
+
+def fake_response(comments=("Crashes on start", "Love it", "Too slow")):
+    """Canned analysis JSON from the benchmark's fake model"""
+    return FakeGenerativeModel().generate_content(ANALYSIS_PROMPT.format('\n'.join(comments))).text
+
+
+@pytest.mark.parametrize('wrapped', [
+    '{text}',
+    '```json\n{text}\n```',
+    'Here is the analysis you asked for:\n{text}\nLet me know if you need more.',
+])
+def test_extract_json_ignores_fences_and_preamble(wrapped):
+    text = fake_response()
+    assert extract_json(wrapped.replace('{text}', text)) == json.loads(text)
+
+
+def test_extract_json_without_object_raises():
+    with pytest.raises(ValueError):
+        extract_json("Sorry, I can't help with that.")
+
+
+def test_truncated_response_keeps_complete_elements():
+    text = fake_response()
+    cut = text[:text.index('"criticalIssues"') + len('"criticalIssues": [{"issue": "App')]
+    data = extract_json(cut)
+    expected = json.loads(text)
+    assert data['sentimentDistribution'] == expected['sentimentDistribution']
+    assert data['topThemes'] == expected['topThemes']
+    assert 'criticalIssues' not in data and 'summary' not in data
+
+
+@pytest.mark.parametrize('end', range(70, 400, 17))
+def test_repair_truncated_json_always_returns_valid_json(end):
+    # Any cut after the first complete element can be repaired
+    text = fake_response()
+    repaired = repair_truncated_json(text[:end])
+    assert isinstance(json.loads(repaired), dict)
+
+
+def test_repair_truncated_json_without_complete_element_raises():
+    with pytest.raises(ValueError):
+        repair_truncated_json('{"summ')
+
+
+def test_validate_insights_coerces_fixable_fields():
+    data = {
+        'sentimentDistribution': [{'name': ' positive ', 'value': '3'}, {'name': 'NEGATIVE', 'value': 1.0}],
+        'topThemes': [{'theme': 42, 'count': '2', 'sentiment': 'Mixed'}],
+        'criticalIssues': [{'issue': 'Crash', 'mentions': '5', 'priority': 'URGENT'}],
+        'trendingTopics': [{'topic': 'dark mode', 'mentions': 1}],
+        'summary': '  Short summary. ',
+        'recommendations': ['Fix it', '', 3],
+        'model_used': 'fake',
+    }
+    valid, broken = validate_insights(data)
+    assert broken == []
+    assert valid['sentimentDistribution'] == [{'name': 'Positive', 'value': 3}, {'name': 'Negative', 'value': 1}]
+    assert valid['topThemes'] == [{'theme': '42', 'count': 2, 'sentiment': 'neutral'}]
+    assert valid['criticalIssues'] == [{'issue': 'Crash', 'mentions': 5, 'priority': 'medium'}]
+    assert valid['summary'] == 'Short summary.'
+    assert valid['recommendations'] == ['Fix it', '3']
+    assert valid['model_used'] == 'fake'
+
+
+def test_validate_insights_reports_only_broken_fields():
+    data = json.loads(fake_response())
+    data['topThemes'] = [{'theme': 'No count'}]
+    data['summary'] = ''
+    data['trendingTopics'] = [{'topic': 'x', 'mentions': True}]
+    del data['recommendations']
+    valid, broken = validate_insights(data)
+    assert broken == ['topThemes', 'trendingTopics', 'summary', 'recommendations']
+    assert set(valid) == {'sentimentDistribution', 'criticalIssues'}
+
+
+def test_validate_insights_rejects_non_object():
+    assert validate_insights(['not', 'a', 'dict']) == ({}, INSIGHT_FIELDS)
+
+
+def test_validate_labels_drops_bad_entries_and_coerces():
+    data = {
+        'themes': ['Stability', ' ', 'Pricing'],
+        'issues': [{'issue': 'App crashes', 'priority': 'HIGH'}, {'issue': 'Slow sync', 'priority': '?'}],
+        'labels': [
+            {'id': 1, 'sentiment': 'Negative', 'themes': [0, 0, 5], 'issues': ['1', 0]},
+            {'id': '2', 'sentiment': 'meh', 'themes': 'oops', 'issues': []},
+            {'id': 2, 'sentiment': 'positive'},
+            {'id': 9, 'sentiment': 'positive'},
+            {'id': None},
+            'junk',
+        ],
+    }
+    labels, priorities = validate_labels(data, count=3)
+    assert labels == {
+        1: {'sentiment': 'negative', 'themes': ['Stability'], 'issues': ['Slow sync', 'App crashes']},
+        2: {'sentiment': 'neutral', 'themes': [], 'issues': []},
+    }
+    assert priorities == {'App crashes': 'high', 'Slow sync': 'medium'}
+
+
+def test_validate_labels_from_fake_model():
+    prompt = "Label each comment\n\nFeedback:\n[1] Crashes\n[2] Love it\n[3] Fine\n\nReturn JSON"
+    data = json.loads(FakeGenerativeModel().generate_content(prompt).text)
+    labels, priorities = validate_labels(data, count=3)
+    assert sorted(labels) == [1, 2, 3]
+    assert labels[3]['issues'] == ['App crashes']
+    assert priorities == {'App crashes': 'high'}
+
+
+class WrappedModel(FakeGenerativeModel):
+    """Fake model whose answers come wrapped in chatter, optionally cut off"""
+
+    def __init__(self, truncate_at=None, **options):
+        super().__init__(**options)
+        self.truncate_at = truncate_at
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        text = super().generate_content(prompt, generation_config=generation_config).text
+        if self.truncate_at is not None and not prompt.startswith("The following aggregated insights"):
+            text = text[:self.truncate_at]
+        text = f"Here you go:\n```json\n{text}\n```"
+        if stream:
+            return [FakeResponse(text[i:i + 5]) for i in range(0, len(text), 5)]
+        return FakeResponse(text)
+
+
+def test_analyzer_parses_wrapped_responses():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=WrappedModel(), structured_output=False)
+    insights = analyzer.analyze_feedback(["Crashes on start", "Love it", "Too slow"])
+    assert insights['summary']
+    assert [theme['theme'] for theme in insights['topThemes']] == ['Stability', 'Performance']
+
+
+def test_analyzer_requests_fields_lost_to_truncation():
+    model = WrappedModel(truncate_at=len(fake_response()) // 2)
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model, structured_output=False)
+    insights = analyzer.analyze_feedback(["Crashes on start", "Love it", "Too slow"])
+    assert insights['sentimentDistribution']
+    assert model.calls > 1
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from job_queue import JobCancelled, JobQueue
+
+
+def wait_until_finished(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status is None or status['status'] in ('done', 'failed', 'cancelled'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_result_and_progress(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'), max_workers=1)
+
+    def job(context, items):
+        for done, _ in enumerate(items, 1):
+            context.progress(done, len(items))
+        return {'count': len(items)}
+
+    job_id = queue.submit(job, [1, 2, 3], owner='me')
+    status = wait_until_finished(queue, job_id)
+    assert (status['status'], status['done'], status['total']) == ('done', 3, 3)
+    assert queue.result(job_id) == {'count': 3}
+    assert [row['job_id'] for row in queue.jobs(owner='me')] == [job_id]
+    queue.shutdown()
+
+
+def test_cancel_stops_a_running_job(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'), max_workers=1)
+    started = threading.Event()
+
+    def job(context):
+        started.set()
+        while True:
+            context.progress(0)
+            time.sleep(0.01)
+
+    job_id = queue.submit(job)
+    started.wait(5)
+    assert queue.cancel(job_id)
+    assert wait_until_finished(queue, job_id)['status'] == 'cancelled'
+    assert queue.result(job_id) is None
+    queue.shutdown()
+
+
+def test_expired_results_are_not_served_and_are_pruned_in_the_background(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'), retention_seconds=0.2, prune_interval=0.05)
+    job_id = queue.submit(lambda context: {'secret': 'insights'})
+    wait_until_finished(queue, job_id)
+    assert queue.result(job_id) == {'secret': 'insights'}
+    time.sleep(0.5)
+    # Without any read or submit, the background thread has already deleted the job
+    with queue._lock:
+        assert job_id not in queue._results
+        assert queue._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+    assert queue.status(job_id) is None and queue.result(job_id) is None
+    queue.shutdown()
+
+
+def test_restart_marks_unfinished_jobs_failed(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite')
+    queue = JobQueue(path, max_workers=1)
+    release = threading.Event()
+    job_id = queue.submit(lambda context: release.wait(5))
+    time.sleep(0.05)
+    restarted = JobQueue(path)
+    status = restarted.status(job_id)
+    assert status['status'] == 'failed' and 'restart' in status['error']
+    release.set()
+    queue.shutdown()
+    restarted.shutdown()
+
+
+def test_job_cancelled_is_raised_from_progress(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'), max_workers=1)
+    raised = []
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def job(context):
+        started.set()
+        proceed.wait(5)
+        try:
+            context.progress(1)
+        except JobCancelled:
+            raised.append(True)
+            raise
+
+    job_id = queue.submit(job)
+    started.wait(5)
+    queue.cancel(job_id)
+    proceed.set()
+    wait_until_finished(queue, job_id)
+    assert raised == [True]
+    queue.shutdown()
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmark import FakeGenerativeModel
+from feedback_analyzer import FeedbackAnalyzer
+from local_classifier import LocalClassifier
+
+
+@pytest.mark.parametrize('comment', [
+    "Feels like forever to load",
+    "Looks like the server is down again",
+    "Battery drains fast",
+    "Thanks for nothing",
+    "Please clean up this mess",
+    "App crashes",
+    "Love it but it crashes",
+    "Not great",
+    "Is it good?",
+])
+def test_complaints_and_ambiguous_comments_go_to_the_model(comment):
+    assert LocalClassifier().classify(comment) is None
+
+
+@pytest.mark.parametrize('comment, themes', [
+    ("Love it!", []),
+    ("Great support, very helpful", ['Customer Support']),
+    ("Intuitive interface", ['Usability']),
+])
+def test_short_positive_comments_are_classified_locally(comment, themes):
+    assert LocalClassifier().classify(comment) == ('positive', themes)
+
+
+def test_negative_comments_keep_their_critical_issues():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=FakeGenerativeModel(), local_classifier=LocalClassifier())
+    insights = analyzer.analyze_feedback(["App crashes"] * 500 + ["Love it!"] * 20)
+    assert insights['local_count'] == 20
+    assert [issue['issue'] for issue in insights['criticalIssues']] == ["App crashes"]
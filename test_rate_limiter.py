@@ -0,0 +1,165 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import feedback_analyzer
+import rate_limiter
+from benchmark import FakeAPIError, FakeGenerativeModel, generate_corpus
+from feedback_analyzer import FeedbackAnalyzer
+from instrumentation import Instrumentation
+from prompt_budget import PromptBudget
+from rate_limiter import RateLimiter, TokenBucket, backoff_delay, is_retryable
+
+
+class FakeClock:
+    """Stands in for the `time` module in rate_limiter; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(feedback_analyzer, 'backoff_delay', lambda attempt: 0)
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(60)
+    for _ in range(60):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_token_bucket_clamps_requests_larger_than_capacity(clock):
+    bucket = TokenBucket(100)
+    bucket.acquire(1000)
+    assert clock.slept == []
+    bucket.acquire(50)
+    assert sum(clock.slept) == pytest.approx(30.0)
+
+
+def test_rate_limiter_applies_both_limits(clock):
+    limiter = RateLimiter(requests_per_minute=120, tokens_per_minute=600)
+    limiter.acquire(600)
+    limiter.acquire(300)
+    # The token bucket is empty, so the second request waits for 300 tokens at 10 tokens/second
+    assert sum(clock.slept) == pytest.approx(30.0)
+
+
+def test_rate_limiter_without_limits_never_waits(clock):
+    limiter = RateLimiter()
+    for _ in range(1000):
+        limiter.acquire(10 ** 6)
+    assert clock.slept == []
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (FakeAPIError(429, "Resource exhausted"), True),
+    (FakeAPIError(503, "Unavailable"), True),
+    (FakeAPIError(400, "Bad request"), False),
+    (Exception("429 Resource has been exhausted (e.g. check quota)."), True),
+    (ValueError("Model returned no usable insights"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_backoff_delay_grows_and_is_capped():
+    for attempt in range(10):
+        for _ in range(20):
+            assert 0 <= backoff_delay(attempt, base=1.0, cap=8.0) <= min(8.0, 2 ** attempt)
+
+
+def test_throttled_calls_are_retried(no_backoff):
+    model = FakeGenerativeModel(error_rate=0.3, seed=1)
+    metrics = Instrumentation()
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model, batch_tokens=500, instrumentation=metrics)
+    insights = analyzer.analyze_feedback(generate_corpus(300))
+    assert insights['batch_count'] > 1
+    assert model.errors > 0
+    assert metrics.snapshot()['counters']['retries'] == model.errors
+
+
+def test_retries_give_up_after_max_retries(no_backoff):
+    model = FakeGenerativeModel(error_rate=1.0)
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model, max_retries=2)
+    with pytest.raises(FakeAPIError):
+        analyzer.analyze_feedback(["App crashes on start"])
+    assert model.calls == 3
+
+
+def test_non_retryable_errors_are_not_retried(no_backoff):
+    class BadRequestModel(FakeGenerativeModel):
+        def generate_content(self, prompt, stream=False, generation_config=None):
+            self.calls += 1
+            raise FakeAPIError(400, "Bad request")
+
+    model = BadRequestModel()
+    with pytest.raises(FakeAPIError):
+        FeedbackAnalyzer(api_key='fake', model=model).analyze_feedback(["App crashes on start"])
+    assert model.calls == 1
+
+
+def test_in_flight_requests_are_bounded():
+    class ConcurrencyModel(FakeGenerativeModel):
+        active = peak = 0
+        lock = threading.Lock()
+
+        def generate_content(self, prompt, stream=False, generation_config=None):
+            with self.lock:
+                ConcurrencyModel.active += 1
+                ConcurrencyModel.peak = max(ConcurrencyModel.peak, ConcurrencyModel.active)
+            try:
+                return super().generate_content(prompt, stream, generation_config)
+            finally:
+                with self.lock:
+                    ConcurrencyModel.active -= 1
+
+    model = ConcurrencyModel(latency=0.02)
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model, batch_tokens=500, max_in_flight=2)
+    insights = analyzer.analyze_feedback(generate_corpus(300))
+    assert insights['batch_count'] > 2
+    assert ConcurrencyModel.peak == 2
+
+
+def test_rate_limiter_is_charged_calibrated_token_counts():
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__()
+            self.acquired = []
+
+        def acquire(self, token_count):
+            self.acquired.append(token_count)
+
+    class RecordingModel(FakeGenerativeModel):
+        prompts = []
+
+        def generate_content(self, prompt, stream=False, generation_config=None):
+            self.prompts.append(prompt)
+            return super().generate_content(prompt, stream, generation_config)
+
+    budget = PromptBudget(model_name='uncalibrated-test-model')
+    budget.chars_per_token = 2.5
+    model = RecordingModel()
+    analyzer = FeedbackAnalyzer(api_key='fake', model=model, prompt_budget=budget)
+    analyzer.rate_limiter = RecordingLimiter()
+    analyzer.analyze_feedback(["App crashes on start"])
+    assert analyzer.rate_limiter.acquired == [budget.count(prompt) for prompt in model.prompts]
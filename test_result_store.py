@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from result_store import ResultStore
+
+
+def run(generated_at, positive, negative, themes=()):
+    return {
+        'generated_at': generated_at,
+        'model_used': 'fake',
+        'comment_count': positive + negative,
+        'sentimentDistribution': [{'name': 'Positive', 'value': positive}, {'name': 'Negative', 'value': negative}],
+        'topThemes': [{'theme': theme, 'count': count, 'sentiment': 'neutral'} for theme, count in themes],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / 'history.sqlite'))
+    # Saturday, Sunday and the following Saturday
+    store.record_run(run('2026-10-10T09:00:00', 1, 1, [('Stability', 2)]))
+    store.record_run(run('2026-10-11T09:00:00', 3, 0, [('Stability', 1), ('Pricing', 4)]))
+    store.record_run(run('2026-10-17T09:00:00', 0, 1, [('stability', 5)]))
+    yield store
+    store.close()
+
+
+def test_weekly_periods_are_labelled_by_their_first_day(store):
+    drift = store.sentiment_drift(freq='W')
+    assert list(drift.index) == [pd.Timestamp('2026-10-04'), pd.Timestamp('2026-10-11')]
+    assert drift.loc['2026-10-04', 'Positive'] == pytest.approx(0.5)
+    assert drift.loc['2026-10-11', 'Positive'] == pytest.approx(0.75)
+
+
+def test_theme_trends_match_themes_case_insensitively(store):
+    trends = store.theme_trends(freq='W')
+    assert list(trends.columns) == ['Stability', 'Pricing']
+    assert trends['Stability'].tolist() == [2, 6]
+    assert trends.loc['2026-10-11', 'Pricing'] == 4
+
+
+def test_trend_queries_filter_by_date(store):
+    trends = store.theme_trends(start='2026-10-11', end='2026-10-11')
+    assert list(trends.index) == [pd.Timestamp('2026-10-11')]
+    assert store.sentiment_drift(start='2027-01-01').empty
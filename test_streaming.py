@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from benchmark import FakeGenerativeModel, FakeResponse
+from feedback_analyzer import FeedbackAnalyzer
+from insights_schema import INSIGHT_FIELDS, StreamingJSONParser
+
+ANALYSIS_PROMPT = "Analyze the following user feedback comments\n\nFeedback:\n{}\n\nReturn JSON"
+
+
+def fake_response(comments=("Crashes on start", "Love it", "Too slow")):
+    """Canned analysis JSON from the benchmark's fake model"""
+    return FakeGenerativeModel().generate_content(ANALYSIS_PROMPT.format('\n'.join(comments))).text
+
+
+def feed_all(parser, chunks):
+    return [field for chunk in chunks for field in parser.feed(chunk)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 200])
+def test_streaming_parser_emits_every_field_for_any_chunking(size):
+    text = fake_response()
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    fields = feed_all(StreamingJSONParser(), chunks)
+    assert [key for key, _ in fields] == INSIGHT_FIELDS
+    assert dict(fields) == json.loads(text)
+
+
+def test_streaming_parser_matches_fake_model_stream():
+    model = FakeGenerativeModel()
+    chunks = [response.text for response in model.generate_content(ANALYSIS_PROMPT.format("a\nb"), stream=True)]
+    assert len(chunks) > 1
+    assert dict(feed_all(StreamingJSONParser(), chunks)) == json.loads(''.join(chunks))
+
+
+def test_streaming_parser_skips_preamble_and_handles_braces_in_strings():
+    text = 'Sure! ```json\n{"summary": "Users say \\"}{\\", oddly", "recommendations": ["a, b", "c]"]}\n```'
+    fields = feed_all(StreamingJSONParser(), list(text))
+    assert fields == [('summary', 'Users say "}{", oddly'), ('recommendations', ['a, b', 'c]'])]
+
+
+def test_streaming_parser_holds_back_incomplete_field():
+    parser = StreamingJSONParser()
+    assert parser.feed('{"summary": "done", "topThemes": [{"theme": "Spe') == [('summary', 'done')]
+    assert parser.feed('ed", "count": 2}]}') == [('topThemes', [{'theme': 'Speed', 'count': 2}])]
+
+
+class ChattyStreamModel(FakeGenerativeModel):
+    """Fake model streaming its answer in small chunks, wrapped in a fenced preamble"""
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        text = f"Here you go:\n```json\n{super().generate_content(prompt).text}\n```"
+        if stream:
+            return [FakeResponse(text[i:i + 5]) for i in range(0, len(text), 5)]
+        return FakeResponse(text)
+
+
+def test_analyze_feedback_stream_yields_sections_before_the_insights():
+    analyzer = FeedbackAnalyzer(api_key='fake', model=ChattyStreamModel(), structured_output=False)
+    sections = list(analyzer.analyze_feedback_stream(["Crashes on start", "Love it", "Too slow"]))
+    names = [name for name, _ in sections]
+    assert names[-1] == 'insights'
+    assert set(INSIGHT_FIELDS) <= set(names[:-1])
+    insights = sections[-1][1]
+    assert insights['criticalIssues'][0]['issue'] == 'App crashes'
+    assert dict(sections)['topThemes'] == insights['topThemes']
+
+
+def test_raising_progress_stops_a_single_batch_stream():
+    class Cancelled(Exception):
+        pass
+
+    chunks_seen = []
+
+    def progress(done, total=None, message=None):
+        chunks_seen.append(done)
+        if len(chunks_seen) == 3:
+            raise Cancelled()
+
+    analyzer = FeedbackAnalyzer(api_key='fake', model=ChattyStreamModel(), structured_output=False)
+    sections = []
+    with pytest.raises(Cancelled):
+        for section in analyzer.analyze_feedback_stream(["Crashes on start", "Love it"], progress=progress):
+            sections.append(section)
+    assert chunks_seen == [0, 0, 0]
+    assert sections == []